@@ -4,15 +4,34 @@ Creates the FastAPI app instance with CORS middleware and static file serving.
 """
 
 import os
+import orjson
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from config import settings
+from .session_cache import SessionCache
+
+# orjson options shared by HTTP responses and WebSocket frames
+# (numpy scalars such as similarity scores serialize like stdlib json would)
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+class Text2SQLJSONResponse(ORJSONResponse):
+    """JSON response rendered with orjson (Rust) instead of the stdlib json module."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Text2SQL API",
     description="Turkish Text-to-SQL conversion API with interactive error handling",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=Text2SQLJSONResponse
 )
 
 # CORS middleware - allow all origins for development
@@ -24,6 +43,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip HTTP responses - /chat embeds the results table as HTML, which compresses very well.
+# WebSocket frames are compressed by uvicorn's permessage-deflate (on by default).
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 # Serve static files (chat.html and assets)
 current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 static_dir = os.path.join(current_dir, "static")
@@ -33,7 +56,8 @@ if os.path.exists(static_dir):
 
 # Global session cache for managing user sessions and LLM instances
 # Key: session_id (str) -> Value: InteractiveSQLGenerator instance
-session_cache = {}
+# Bounded (LRU) with an idle TTL so abandoned sessions do not accumulate
+session_cache = SessionCache(maxsize=settings.SESSION_CACHE_MAX, ttl=settings.SESSION_TTL_SECONDS)
 
 # Import and include routers
 from .routes import router
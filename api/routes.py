@@ -6,9 +6,10 @@ Defines all HTTP and WebSocket endpoints for the Text2SQL system.
 import os
 from typing import Optional, Dict
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-import asyncio
+import orjson
 
 from core import InteractiveSQLGenerator
 from sql import results_to_html
@@ -16,6 +17,12 @@ from sql import results_to_html
 # Create API router
 router = APIRouter()
 
+# chat.html ships with the app: resolve its path (and whether it exists) once at import
+CHAT_HTML_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "chat.html"
+)
+CHAT_HTML_EXISTS = os.path.exists(CHAT_HTML_PATH)
+
 # ==================== REQUEST MODELS ====================
 class ChatRequest(BaseModel):
     """Request model for /chat endpoint"""
@@ -24,6 +31,20 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+# ==================== CONSTANT WEBSOCKET FRAMES ====================
+# Fixed-shape frames are serialized once at import and sent as-is
+WS_DONE_FRAME = orjson.dumps({"type": "done"}).decode("utf-8")
+WS_QUESTION_REQUIRED_FRAME = orjson.dumps({
+    "type": "error",
+    "content": "Question is required"
+}).decode("utf-8")
+WS_SUCCESS_EXPLANATION_FRAME = orjson.dumps({
+    "type": "token",
+    "content_type": "explanation",
+    "content": "Sorgunuz başarıyla SQL'e dönüştürüldü. Aşağıda oluşturulan SQL sorgusunu ve sonuçları görebilirsiniz."
+}).decode("utf-8")
+
+
 # ==================== HELPER FUNCTIONS ====================
 def get_session_cache():
     """Get the global session cache from main.py"""
@@ -31,29 +52,29 @@ def get_session_cache():
     return session_cache
 
 
+async def send_ws_json(websocket: WebSocket, payload: Dict):
+    """Send a JSON text frame serialized with orjson (WebSocket.send_json uses stdlib json)."""
+    from .main import ORJSON_OPTIONS
+    await websocket.send_text(orjson.dumps(payload, option=ORJSON_OPTIONS).decode("utf-8"))
+
+
 def get_or_create_generator(session_id: str) -> InteractiveSQLGenerator:
     """Get existing or create new InteractiveSQLGenerator for session"""
     session_cache = get_session_cache()
-    
-    if session_id not in session_cache:
-        session_cache[session_id] = InteractiveSQLGenerator()
-    
-    return session_cache[session_id]
+    # Atomic lookup/creation (also refreshes the session's TTL)
+    return session_cache.get_or_create(session_id, InteractiveSQLGenerator)
 
 
 # ==================== ROOT ENDPOINT ====================
 @router.get("/")
 def read_root():
     """Root page - serves chat.html"""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    chat_html_path = os.path.join(current_dir, "static", "chat.html")
-    
-    if os.path.exists(chat_html_path):
-        return FileResponse(chat_html_path)
+    if CHAT_HTML_EXISTS:
+        return FileResponse(CHAT_HTML_PATH)
     else:
         raise HTTPException(
             status_code=404,
-            detail=f"chat.html not found at {chat_html_path}. Ensure ./static/chat.html exists."
+            detail=f"chat.html not found at {CHAT_HTML_PATH}. Ensure ./static/chat.html exists."
         )
 
 
@@ -80,7 +101,7 @@ def chat(req: ChatRequest):
         
         if result["success"]:
             # Success: return SQL and HTML results
-            html = results_to_html(result["columns"], result["rows"])
+            html = results_to_html(result["columns"], result["rows"], result.get("truncated", False))
             return {
                 "success": True,
                 "sql": result["sql"],
@@ -141,66 +162,59 @@ async def websocket_chat(websocket: WebSocket):
         session_id = data.get("session_id", "default")
         
         if not question:
-            await websocket.send_json({
-                "type": "error",
-                "content": "Question is required"
-            })
+            await websocket.send_text(WS_QUESTION_REQUIRED_FRAME)
             return
         
         # Get or create generator for this session
-        generator = get_or_create_generator(session_id)
+        # (blocking work - model loading, search, LLM, DB - runs on a worker thread,
+        # so the event loop keeps serving other connections meanwhile)
+        generator = await run_in_threadpool(get_or_create_generator, session_id)
         
-        # Generate SQL (non-streaming for now, but sent in chunks)
-        result = generator.generate_with_feedback(question, None)
+        # Generate SQL (non-streaming for now)
+        result = await run_in_threadpool(generator.generate_with_feedback, question, None)
         
         if result["success"]:
             # Send explanation
-            await websocket.send_json({
+            await websocket.send_text(WS_SUCCESS_EXPLANATION_FRAME)
+            
+            # Send SQL in a single frame (it is fully generated at this point)
+            await send_ws_json(websocket, {
                 "type": "token",
-                "content_type": "explanation",
-                "content": "Sorgunuz başarıyla SQL'e dönüştürüldü. Aşağıda oluşturulan SQL sorgusunu ve sonuçları görebilirsiniz."
+                "content_type": "sql",
+                "content": result["sql"]
             })
             
-            # Send SQL in chunks (simulate streaming)
-            sql = result["sql"]
-            chunk_size = 50
-            for i in range(0, len(sql), chunk_size):
-                await websocket.send_json({
-                    "type": "token",
-                    "content_type": "sql",
-                    "content": sql[i:i+chunk_size]
-                })
-                await asyncio.sleep(0.05)  # Small delay for streaming effect
-            
             # Send results as HTML table
-            html = results_to_html(result["columns"], result["rows"])
-            await websocket.send_json({
+            html = await run_in_threadpool(
+                results_to_html, result["columns"], result["rows"], result.get("truncated", False)
+            )
+            await send_ws_json(websocket, {
                 "type": "token",
                 "content_type": "results",
                 "content": html
             })
             
             # Send done signal
-            await websocket.send_json({"type": "done"})
+            await websocket.send_text(WS_DONE_FRAME)
         else:
             # Send error message
             error_msg = result.get("error", "Bilinmeyen hata")
             if result.get("needs_clarification"):
                 error_msg = result.get("clarification_question", error_msg)
             
-            await websocket.send_json({
+            await send_ws_json(websocket, {
                 "type": "token",
                 "content_type": "explanation",
                 "content": f"Hata oluştu: {error_msg}"
             })
-            await websocket.send_json({"type": "done"})
+            await websocket.send_text(WS_DONE_FRAME)
             
     except WebSocketDisconnect:
         print("WebSocket: Client disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
         try:
-            await websocket.send_json({
+            await send_ws_json(websocket, {
                 "type": "error",
                 "content": str(e)
             })
@@ -234,11 +248,8 @@ def health_check():
 
 @router.get("/check-chat-html")
 def check_chat_html():
-    """Check if chat.html exists"""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    chat_html_path = os.path.join(current_dir, "static", "chat.html")
-    
+    """Check if chat.html exists (checked live - this is the diagnostic endpoint)"""
     return {
-        "exists": os.path.exists(chat_html_path),
-        "path": chat_html_path
+        "exists": os.path.exists(CHAT_HTML_PATH),
+        "path": CHAT_HTML_PATH
     }
@@ -0,0 +1,96 @@
+"""
+Session Cache - Bounded LRU + TTL store for per-session generators
+Keeps one InteractiveSQLGenerator per session_id, evicting idle and least-recently-used sessions.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class SessionCache:
+    """
+    Thread-safe LRU cache with idle TTL.
+
+    Supports the dict operations the routes use (`in`, `[]`, `[]=`, `del`, `len`).
+    Every read refreshes the entry's TTL and LRU position; expired entries are
+    dropped lazily on access and in bulk whenever a new session is inserted.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, last_access)
+        self._lock = threading.RLock()
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return now - last_access > self.ttl
+
+    def _evict(self, now: float):
+        """Drop expired sessions (oldest first), then LRU sessions beyond maxsize."""
+        while self._data:
+            key, (_, last_access) = next(iter(self._data.items()))
+            if not self._expired(last_access, now):
+                break
+            del self._data[key]
+            print(f"🧹 [SESSION_CACHE] Session '{key}' expired")
+        while len(self._data) > self.maxsize:
+            key, _ = self._data.popitem(last=False)
+            print(f"🧹 [SESSION_CACHE] Session '{key}' evicted (LRU)")
+
+    def get_or_create(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Return the session's value, creating it with `factory` if missing or expired."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._data.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._data[key] = (entry[0], now)
+                self._data.move_to_end(key)
+                return entry[0]
+        # Build outside the lock so a slow factory doesn't block every other session
+        value = factory()
+        with self._lock:
+            now = time.monotonic()
+            entry = self._data.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                # Another request created this session meanwhile; keep its value
+                value = entry[0]
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            self._evict(now)
+            return value
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            if self._expired(entry[1], time.monotonic()):
+                del self._data[key]
+                return False
+            return True
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            value = self._data[key][0]
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: str, value: Any):
+        with self._lock:
+            now = time.monotonic()
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            self._evict(now)
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            del self._data[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
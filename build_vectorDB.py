@@ -19,16 +19,20 @@ Usage:
 
 import os
 import json
+import time
 import importlib.util
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional, Iterable, Union
 
 import numpy as np
+import pandas as pd
 import psycopg2
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.models import PointStruct
-from sklearn.feature_extraction.text import TfidfVectorizer
+from qdrant_client.http.exceptions import UnexpectedResponse, ResponseHandlingException
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
 from sklearn.metrics.pairwise import cosine_similarity
 
 # Import shared settings and helper functions from config.py
@@ -37,6 +41,9 @@ try:
 except Exception as e:
     raise ImportError("Couldn't import config.py. Make sure config.py is in the PYTHONPATH and valid. Error: %s" % e)
 
+from utils.gpu import configure_torch_threads
+from utils.models import _load_sentence_transformer
+
 
 # ==================== GPU DETECTION ====================
 def detect_gpu():
@@ -61,6 +68,9 @@ if settings.USE_GPU is False:
     print("⚙️ Ayarlardan dolayı CPU zorlandı")
     DEVICE = 'cpu'
 print(f"🔧 build_vectorDB {DEVICE.upper()} üzerinde çalışacak")
+
+# Bazı ortamlarda PyTorch varsayılan olarak tek thread kullanır; CPU'da tüm çekirdekleri kullan
+configure_torch_threads(DEVICE)
 # ==================== GPU DETECTION END ====================
 
 # ------------------ Runtime configuration derived from config.py ------------------
@@ -69,16 +79,59 @@ QDRANT_CLIENT: QdrantClient = create_qdrant_client()
 EMBEDDING_MODEL_NAME = settings.EMBEDDING_MODEL_NAME
 TFIDF_VECTORIZER_PATH = settings.TFIDF_VECTORIZER_PATH
 LEXICAL_FASTTEXT_PATH = settings.LEXICAL_FASTTEXT_PATH
-BATCH_SIZE = getattr(settings, "MAX_INITIAL_RESULTS", 128) or 128
+# Points per Qdrant upsert request (model.encode batches separately with settings.BATCH_SIZE)
+BATCH_SIZE = settings.QDRANT_UPSERT_BATCH
 
-# Initialize embedding model - GPU desteğiyle
-EMBEDDING_MODEL = SentenceTransformer(EMBEDDING_MODEL_NAME, device=DEVICE)
+# Initialize embedding model - GPU desteğiyle. Shared loader with the API (utils/models.py):
+# local safetensors copy under EMBEDDING_CACHE_DIR, ONNX Runtime on CPU if enabled
+EMBEDDING_MODEL = _load_sentence_transformer(EMBEDDING_MODEL_NAME, device=DEVICE)
 VECTOR_SIZE = EMBEDDING_MODEL.get_sentence_embedding_dimension()
-LEXICAL_VECTOR_SIZE_DEFAULT = 1000
-
-# Schema name used for information_schema queries. Read from settings.DB_SCHEMA
+DATA_SAMPLE_ENCODE_CHUNK = 4096  # data sample texts buffered per encode() call
+UPSERT_WORKERS = 4  # concurrent upsert requests per collection
+UPSERT_RETRIES = 4  # attempts per batch on throttling / transient server errors
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+BUILD_WORK_MEM = "64MB"  # per-sort memory for the shared build connection (DISTINCT sampling)
+DATA_SAMPLE_MIN_DISTINCT = 3  # text columns with fewer distinct values (flags like 'Y'/'N') are not sampled
+DATA_SAMPLE_MIN_WIDTH = 3  # ... nor columns whose values average under this many bytes (pg_stats.avg_width)
+LEXICAL_HASH_FEATURES = 2 ** 18  # hashed n-gram space; sparse vectors make the width free, so keep collisions rare
+
+# Schema name used for catalog queries. Read from settings.DB_SCHEMA
 SCHEMA_NAME = settings.DB_SCHEMA
 
+# Columns of the schema's tables, views and foreign/partitioned tables (the relations
+# information_schema.columns lists), read from pg_catalog directly: the information_schema
+# views add their own joins and per-row privilege checks on top of these catalogs.
+# format_type(..., NULL) gives the same names as information_schema's data_type
+# ('character varying', 'integer', 'timestamp without time zone', ...).
+SCHEMA_COLUMNS_SQL = """
+    SELECT c.relname, a.attname, format_type(a.atttypid, NULL)
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = %s
+      AND c.relkind IN ('r', 'p', 'v', 'f')
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum
+"""
+
+# Planner statistics per column (filled by ANALYZE / autovacuum); columns never analyzed have no row.
+# n_distinct > 0 is an estimated count, < 0 a fraction of the row count (i.e. grows with the table).
+COLUMN_STATS_SQL = """
+    SELECT tablename, attname, n_distinct, avg_width
+    FROM pg_catalog.pg_stats
+    WHERE schemaname = %s
+"""
+
+# Base tables of the schema (information_schema.tables' 'BASE TABLE')
+SCHEMA_TABLES_SQL = """
+    SELECT c.relname
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = %s
+      AND c.relkind IN ('r', 'p')
+"""
+
 # ------------------ Utility / I/O ------------------
 
 def get_source_conn():
@@ -86,11 +139,74 @@ def get_source_conn():
     return psycopg2.connect(**DB_CONN_KW)
 
 
+def get_build_conn():
+    """Return the read-only connection main() shares across all builder steps.
+
+    Opened once instead of once per step (one TCP/auth handshake, one backend).
+    work_mem is raised for the session so the DISTINCT sampling sorts stay in memory.
+    """
+    conn = get_source_conn()
+    conn.set_session(readonly=True)
+    with conn.cursor() as cur:
+        cur.execute("SET work_mem = %s", (BUILD_WORK_MEM,))
+    conn.commit()  # a plain SET is rolled back with its transaction; commit keeps it for the session
+    return conn
+
+
+def _release_source_conn(src, owned: bool):
+    """Close a connection a builder opened itself; end the read transaction on a shared one."""
+    try:
+        if owned:
+            src.close()
+        else:
+            src.rollback()
+    except Exception:
+        pass
+
+
 def get_qdrant_client() -> QdrantClient:
     """Return Qdrant client created from config.py helper."""
     return QDRANT_CLIENT
 
 
+PointBatch = Union[List[PointStruct], models.Batch]
+
+
+def _upsert_with_retry(client: QdrantClient, collection_name: str, points: PointBatch) -> int:
+    """Upsert one batch, retrying throttled / unavailable responses with exponential backoff."""
+    for attempt in range(UPSERT_RETRIES):
+        try:
+            client.upsert(collection_name=collection_name, points=points)
+            return len(points.ids) if isinstance(points, models.Batch) else len(points)
+        except (UnexpectedResponse, ResponseHandlingException) as e:
+            status = getattr(e, "status_code", None)
+            retryable = isinstance(e, ResponseHandlingException) or status in RETRYABLE_STATUS_CODES
+            if not retryable or attempt == UPSERT_RETRIES - 1:
+                raise
+            delay = 0.5 * (2 ** attempt)
+            print(f"Upsert to {collection_name} failed ({status or e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def upsert_batches(client: QdrantClient, collection_name: str,
+                   batches: Iterable[PointBatch], label: str = "points"):
+    """Upload point batches with up to UPSERT_WORKERS requests in flight.
+
+    Batches are pulled from `batches` lazily, so at most 2 * UPSERT_WORKERS of them
+    are held in memory. Network round-trips overlap instead of running back to back.
+    """
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+        in_flight = set()
+        for points in batches:
+            if len(in_flight) >= 2 * UPSERT_WORKERS:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    print(f"Uploaded {future.result()} {label} points")
+            in_flight.add(executor.submit(_upsert_with_retry, client, collection_name, points))
+        for future in in_flight:
+            print(f"Uploaded {future.result()} {label} points")
+
+
 # ------------------ Schema keywords loader (external file) ------------------
 
 def load_schema_keywords() -> Optional[Dict[str, Any]]:
@@ -147,16 +263,85 @@ def tokenize(text: str) -> List[str]:
     return [w for w in t.split() if len(w) > 1]
 
 
+def normalize_identifiers(names: Iterable[Any]) -> pd.Series:
+    """Lower-case identifiers and turn underscores into spaces for the whole column at once."""
+    return pd.Series(list(names), dtype=object).astype(str).str.replace("_", " ", regex=False).str.lower()
+
+
 # ------------------ Qdrant collections setup ------------------
 
-def create_qdrant_collections(client: QdrantClient, lexical_vector_size: int = LEXICAL_VECTOR_SIZE_DEFAULT):
+# recreate_collection is deprecated in newer qdrant-client releases; pick the API once at import
+_HAS_COLLECTION_EXISTS = hasattr(QdrantClient, "collection_exists")
+
+
+def recreate_cosine_collection(client: QdrantClient, collection_name: str, size: int,
+                               quantization_config: Optional[models.QuantizationConfig] = None):
+    """Drop (if present) and create a cosine-distance collection with `size`-dim vectors."""
+    vectors_config = models.VectorParams(size=size, distance=models.Distance.COSINE)
+    if _HAS_COLLECTION_EXISTS:
+        if client.collection_exists(collection_name=collection_name):
+            client.delete_collection(collection_name=collection_name)
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=vectors_config,
+            quantization_config=quantization_config,
+        )
+    else:
+        client.recreate_collection(
+            collection_name=collection_name,
+            vectors_config=vectors_config,
+            quantization_config=quantization_config,
+        )
+
+
+def recreate_sparse_collection(client: QdrantClient, collection_name: str, vector_name: str):
+    """Drop (if present) and create a collection holding one named sparse vector per point.
+
+    Sparse vectors have no fixed dimension and are scored with a dot product, which equals
+    cosine similarity for the L2-normalized TF-IDF rows.
+    """
+    sparse_vectors_config = {vector_name: models.SparseVectorParams()}
+    if _HAS_COLLECTION_EXISTS:
+        if client.collection_exists(collection_name=collection_name):
+            client.delete_collection(collection_name=collection_name)
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config={},
+            sparse_vectors_config=sparse_vectors_config,
+        )
+    else:
+        client.recreate_collection(
+            collection_name=collection_name,
+            vectors_config={},
+            sparse_vectors_config=sparse_vectors_config,
+        )
+
+
+def semantic_quantization_config() -> Optional[models.QuantizationConfig]:
+    """int8 scalar quantization for the semantic collections (~4x less vector RAM, faster search).
+
+    Quantized vectors stay in RAM for the first search pass; the original float32 vectors
+    remain stored for rescoring. Disabled with QDRANT_SCALAR_QUANTIZATION=false.
+    """
+    if not settings.QDRANT_SCALAR_QUANTIZATION:
+        return None
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=0.99,
+            always_ram=True,
+        )
+    )
+
+
+def create_qdrant_collections(client: QdrantClient):
     """Recreate the collections used by the pipeline.
 
     Collections created:
       - schema_embeddings          (semantic schema vectors)
       - schema_keywords            (semantic keyword vectors)
       - data_samples               (semantic value vectors)
-      - lexical_embeddings         (TF-IDF / n-gram lexical vectors)
+      - lexical_embeddings         (TF-IDF / n-gram sparse vectors)
     """
 
     # Prefer an explicit EMBEDDING_DIM from settings when provided (for overrides),
@@ -164,63 +349,39 @@ def create_qdrant_collections(client: QdrantClient, lexical_vector_size: int = L
     embedding_dim = getattr(settings, "EMBEDDING_DIM", VECTOR_SIZE)
 
     # semantic collections using embedding dimension
-    try:
-        client.recreate_collection(
-            collection_name=settings.QDRANT_SCHEMA_COLLECTION,
-            vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE),
-        )
-        client.recreate_collection(
-            collection_name=settings.QDRANT_KEYWORDS_COLLECTION,
-            vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE),
-        )
-        client.recreate_collection(
-            collection_name=settings.QDRANT_DATA_SAMPLES_COLLECTION,
-            vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE),
-        )
-    except TypeError:
-        # fallback for older qdrant-client versions
-        client.recreate_collection(settings.QDRANT_SCHEMA_COLLECTION, vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE))
-        client.recreate_collection(settings.QDRANT_KEYWORDS_COLLECTION, vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE))
-        client.recreate_collection(settings.QDRANT_DATA_SAMPLES_COLLECTION, vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE))
-
-    # lexical collection (size determined by TF-IDF vectorizer max_features)
-    client.recreate_collection(
-        collection_name=settings.QDRANT_LEXICAL_COLLECTION,
-        vectors_config=models.VectorParams(size=lexical_vector_size, distance=models.Distance.COSINE),
-    )
+    quantization = semantic_quantization_config()
+    recreate_cosine_collection(client, settings.QDRANT_SCHEMA_COLLECTION, embedding_dim, quantization)
+    recreate_cosine_collection(client, settings.QDRANT_KEYWORDS_COLLECTION, embedding_dim, quantization)
+    recreate_cosine_collection(client, settings.QDRANT_DATA_SAMPLES_COLLECTION, embedding_dim, quantization)
+
+    # lexical collection (sparse: one weight per n-gram present, no fixed dimension)
+    recreate_sparse_collection(client, settings.QDRANT_LEXICAL_COLLECTION, settings.QDRANT_LEXICAL_VECTOR_NAME)
 
-    print(f"Collections recreated: schema_embeddings(schema dim={embedding_dim}), schema_keywords(schema dim={embedding_dim}), data_samples(schema dim={embedding_dim}), lexical_embeddings(size={lexical_vector_size})")
+    print(f"Collections recreated: schema_embeddings(schema dim={embedding_dim}), schema_keywords(schema dim={embedding_dim}), data_samples(schema dim={embedding_dim}), lexical_embeddings(sparse)")
 
 
 # ------------------ Lexical embeddings using TF-IDF (char n-gram) ------------------
 
-def build_lexical_embeddings(client: QdrantClient, batch_size: int = BATCH_SIZE):
+def build_lexical_embeddings(client: QdrantClient, batch_size: int = BATCH_SIZE, src=None):
     """Builds TF-IDF (character n-gram) vectors for <table, column> pairs and uploads to Qdrant.
     The TF-IDF vectorizer is saved to the path defined in config.
     """
     print("Building lexical embeddings (TF-IDF + char n-grams)")
 
-    src = get_source_conn()
+    owns_conn = src is None  # called standalone: open (and close) a connection of our own
+    if owns_conn:
+        src = get_source_conn()
     cur = src.cursor()
 
     try:
-        cur.execute("""
-            SELECT table_name, column_name
-            FROM information_schema.columns
-            WHERE table_schema = %s
-            ORDER BY table_name, ordinal_position
-        """, (SCHEMA_NAME,))
-        table_columns = cur.fetchall()
-
-        documents: List[str] = []
-        column_info: List[tuple] = []
-
-        for table, column in table_columns:
-            table_clean = str(table).replace("_", " ").lower()
-            column_clean = str(column).replace("_", " ").lower()
-            combined_text = f"{table_clean} {column_clean}"
-            documents.append(combined_text)
-            column_info.append((table, column, combined_text))
+        cur.execute(SCHEMA_COLUMNS_SQL, (SCHEMA_NAME,))
+        table_columns = [(table, column) for table, column, _ in cur.fetchall()]
+
+        # Normalize the table and column names column-wise instead of row by row
+        tables = [table for table, _ in table_columns]
+        columns = [column for _, column in table_columns]
+        documents: List[str] = (normalize_identifiers(tables) + " " + normalize_identifiers(columns)).tolist()
+        column_info: List[tuple] = list(zip(tables, columns, documents))
 
         print(f"Found {len(documents)} table-column combinations")
 
@@ -228,59 +389,49 @@ def build_lexical_embeddings(client: QdrantClient, batch_size: int = BATCH_SIZE)
             print("No table-column documents found; skipping lexical embeddings.")
             return
 
-        vectorizer = TfidfVectorizer(
-            analyzer='char_wb',
-            ngram_range=(2, 4),
-            min_df=2,
-            max_features=LEXICAL_VECTOR_SIZE_DEFAULT,
+        # Hashed char n-grams + IDF weighting: no vocabulary is built, held or saved (only the
+        # IDF weights are fitted), and sparse vectors only store the n-grams a document contains
+        vectorizer = make_pipeline(
+            HashingVectorizer(
+                analyzer='char_wb',
+                ngram_range=(2, 4),
+                n_features=LEXICAL_HASH_FEATURES,
+                norm=None,  # raw counts; normalized after IDF weighting
+                alternate_sign=False,
+                dtype=np.float32,  # Qdrant stores float32; float64 only doubled matrix and chunk memory
+            ),
+            TfidfTransformer(norm='l2'),  # unit-length rows: Qdrant's sparse dot product is then cosine similarity
         )
 
-        tfidf_matrix = vectorizer.fit_transform(documents)
-        lexical_vector_size = min(LEXICAL_VECTOR_SIZE_DEFAULT, tfidf_matrix.shape[1])
+        tfidf_matrix = vectorizer.fit_transform(documents).tocsr()
+        print(f"TF-IDF matrix: {tfidf_matrix.shape[0]} documents, {tfidf_matrix.nnz} non-zero n-gram weights")
 
-        # Ensure only the lexical collection is recreated/updated with the correct size.
+        # Ensure only the lexical collection is recreated/updated.
         # Recreating all collections here would erase previously uploaded semantic vectors.
-        client_local = get_qdrant_client()
-        try:
-            client_local.recreate_collection(
-                collection_name="lexical_embeddings",
-                vectors_config=models.VectorParams(size=lexical_vector_size, distance=models.Distance.COSINE),
-            )
-        except TypeError:
-            # fallback for older qdrant-client versions
-            client_local.recreate_collection("lexical_embeddings", vectors_config=models.VectorParams(size=lexical_vector_size, distance=models.Distance.COSINE))
-
-        # Upload points in batches
-        points: List[PointStruct] = []
-        for i, (table, column, combined_text) in enumerate(column_info):
-            try:
-                row = tfidf_matrix.getrow(i)
-                dense_vector = row.toarray().ravel()
-                norm = np.linalg.norm(dense_vector)
-                if norm > 0:
-                    dense_vector = dense_vector / norm
-
-                payload = {
-                    "table_name": table,
-                    "column_name": column,
-                    "combined_text": combined_text,
-                    "embedding_type": "tfidf_ngram",
-                }
-
-                points.append(PointStruct(id=i + 1, vector=dense_vector.tolist(), payload=payload))
-
-                if len(points) >= batch_size:
-                    client.upsert(collection_name=settings.QDRANT_LEXICAL_COLLECTION, points=points)
-                    print(f"Uploaded {len(points)} lexical points")
-                    points = []
-
-            except Exception as e:
-                print(f"Warning: {table}.{column} error: {e}")
-                continue
-
-        if points:
-            client.upsert(collection_name="lexical_embeddings", points=points)
-            print(f"Uploaded {len(points)} lexical points (final)")
+        vector_name = settings.QDRANT_LEXICAL_VECTOR_NAME
+        recreate_sparse_collection(get_qdrant_client(), settings.QDRANT_LEXICAL_COLLECTION, vector_name)
+
+        # Each point carries its CSR row slice (indices + weights) as-is; nothing is densified
+        indptr, indices, data = tfidf_matrix.indptr, tfidf_matrix.indices, tfidf_matrix.data
+
+        def lexical_batches():
+            for start in range(0, len(column_info), batch_size):
+                stop = min(start + batch_size, len(column_info))
+                points: List[PointStruct] = []
+                for row in range(start, stop):
+                    table, column, combined_text = column_info[row]
+                    lo, hi = indptr[row], indptr[row + 1]
+                    payload = {
+                        "table_name": table,
+                        "column_name": column,
+                        "combined_text": combined_text,
+                        "embedding_type": "tfidf_ngram",
+                    }
+                    vector = {vector_name: models.SparseVector(indices=indices[lo:hi].tolist(), values=data[lo:hi].tolist())}
+                    points.append(PointStruct(id=row + 1, vector=vector, payload=payload))
+                yield points
+
+        upsert_batches(client, settings.QDRANT_LEXICAL_COLLECTION, lexical_batches(), label="lexical")
 
         # Save the TF-IDF vectorizer
         import joblib
@@ -301,11 +452,73 @@ def build_lexical_embeddings(client: QdrantClient, batch_size: int = BATCH_SIZE)
 
     finally:
         cur.close()
-        src.close()
+        _release_source_conn(src, owns_conn)
+
+
+# ------------------ Batched semantic encoding ------------------
+
+def embed_and_upload(client: QdrantClient, collection_name: str, texts: List[str],
+                     payloads: List[Dict[str, Any]], first_id: int, batch_size: int = BATCH_SIZE,
+                     label: str = "embedding") -> int:
+    """Encode `texts` in one batched model call and upsert them as points.
+
+    One encode() over the whole list instead of one forward pass per text: the model
+    runs full batches of settings.BATCH_SIZE, and sentence-transformers sorts the list
+    by length first so each batch is padded only to its own longest text.
+    Embeddings come back L2-normalized. Point ids are assigned sequentially from
+    `first_id`; returns the next free id.
+    """
+    if not texts:
+        return first_id
+
+    # Identical texts are encoded once and scattered back to every point that uses them
+    unique_index: Dict[str, int] = {}
+    inverse = np.fromiter(
+        (unique_index.setdefault(text, len(unique_index)) for text in texts),
+        dtype=np.intp, count=len(texts)
+    )
+    unique_embs = EMBEDDING_MODEL.encode(
+        list(unique_index),
+        batch_size=settings.BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    ).astype(np.float32, copy=False)  # FP16 models return half-precision arrays; Qdrant stores float32
+    embs = unique_embs if len(unique_index) == len(texts) else unique_embs[inverse]
+    if len(unique_index) < len(texts):
+        print(f"Encoded {len(unique_index)} unique {label} texts ({len(texts) - len(unique_index)} duplicates reused)")
+
+    # Columnar batches (ids / vectors / payloads as parallel lists): each batch's vectors are
+    # converted with one tolist() on a contiguous slice of `embs`, and no per-point
+    # PointStruct model is built and validated
+    def point_batches():
+        for start in range(0, len(texts), batch_size):
+            stop = min(start + batch_size, len(texts))
+            yield models.Batch(
+                ids=list(range(first_id + start, first_id + stop)),
+                vectors=embs[start:stop].tolist(),
+                payloads=payloads[start:stop],
+            )
+
+    upsert_batches(client, collection_name, point_batches(), label=label)
+
+    return first_id + len(texts)
 
 
 # ------------------ Schema keywords (semantic) ------------------
 
+def _normalize_keyword_items(items) -> List[tuple]:
+    """Bring keyword entries to [(keyword, type), ...].
+
+    Handles both formats: ["keyword1", "keyword2"] or [("keyword1", "type"), ...];
+    a bare string gets the "synonym" type. JSON / YAML files give pairs as lists.
+    """
+    return [
+        (str(item[0]), item[1]) if isinstance(item, (tuple, list)) else (str(item), "synonym")
+        for item in items
+    ]
+
+
 def build_schema_keywords(client: QdrantClient, schema_keywords: Dict[str, Any], batch_size: int = BATCH_SIZE):
     """Create semantic keyword embeddings from the user-supplied schema keywords mapping.
 
@@ -316,216 +529,233 @@ def build_schema_keywords(client: QdrantClient, schema_keywords: Dict[str, Any],
         return
 
     print("Building schema keywords (semantic)")
-    points: List[PointStruct] = []
-    id_counter = 1
+    # Pass 1: collect every keyword text; pass 2 encodes them in one batched call
+    texts: List[str] = []
+    payloads: List[Dict[str, Any]] = []
 
     for table_name, config in schema_keywords.items():
-        # Handle both formats: ["keyword1", "keyword2"] or [("keyword1", "type"), ...]
-        table_kws = config.get("table_keywords", [])
-        for item in table_kws:
-            if isinstance(item, tuple):
-                keyword, kw_type = item
-            else:
-                # If it's a string, use "synonym" as default type
-                keyword = item
-                kw_type = "synonym"
-            
-            text = f"{keyword} table (alternative name for {table_name})"
-            emb = EMBEDDING_MODEL.encode([text])[0]
-            payload = {
+        table_items = _normalize_keyword_items(config.get("table_keywords", []))
+        suffix = f" table (alternative name for {table_name})"  # built once per table
+        texts.extend([keyword + suffix for keyword, _ in table_items])
+        payloads.extend([
+            {
                 "table_name": table_name,
                 "column_name": None,
                 "keyword": keyword,
                 "keyword_type": kw_type,
                 "embedding_type": "semantic_keyword",
             }
-            points.append(PointStruct(id=id_counter, vector=emb.tolist(), payload=payload))
-            id_counter += 1
-
-            if len(points) >= batch_size:
-                client.upsert(collection_name="schema_keywords", points=points)
-                print(f"Uploaded {len(points)} keyword points")
-                points = []
+            for keyword, kw_type in table_items
+        ])
 
         for col_name, keywords in config.get("column_keywords", {}).items():
-            for item in keywords:
-                if isinstance(item, tuple):
-                    keyword, kw_type = item
-                else:
-                    keyword = item
-                    kw_type = "synonym"
-                
-                text = f"{keyword} column (alternative name for {table_name}.{col_name})"
-                emb = EMBEDDING_MODEL.encode([text])[0]
-                payload = {
+            col_items = _normalize_keyword_items(keywords)
+            suffix = f" column (alternative name for {table_name}.{col_name})"  # built once per column
+            texts.extend([keyword + suffix for keyword, _ in col_items])
+            payloads.extend([
+                {
                     "table_name": table_name,
                     "column_name": col_name,
                     "keyword": keyword,
                     "keyword_type": kw_type,
                     "embedding_type": "semantic_keyword",
                 }
-                points.append(PointStruct(id=id_counter, vector=emb.tolist(), payload=payload))
-                id_counter += 1
-
-                if len(points) >= batch_size:
-                    client.upsert(collection_name=settings.QDRANT_KEYWORDS_COLLECTION, points=points)
-                    print(f"Uploaded {len(points)} keyword points")
-                    points = []
+                for keyword, kw_type in col_items
+            ])
 
-    if points:
-        client.upsert(collection_name="schema_keywords", points=points)
-        print(f"Uploaded {len(points)} keyword points (final)")
+    next_id = embed_and_upload(
+        client, settings.QDRANT_KEYWORDS_COLLECTION, texts, payloads,
+        first_id=1, batch_size=batch_size, label="keyword"
+    )
 
-    print(f"Schema keywords built: {id_counter-1} vectors")
+    print(f"Schema keywords built: {next_id-1} vectors")
 
 
 # ------------------ Schema embeddings (semantic) ------------------
 
-def build_schema_embeddings(client: QdrantClient, batch_size: int = BATCH_SIZE):
+def build_schema_embeddings(client: QdrantClient, batch_size: int = BATCH_SIZE, src=None):
     """Build semantic embeddings for schema entries (table.column + data type).
     Uploads embeddings to the 'schema_embeddings' collection.
     """
     print("Building schema embeddings (semantic)")
 
-    src = get_source_conn()
+    owns_conn = src is None  # called standalone: open (and close) a connection of our own
+    if owns_conn:
+        src = get_source_conn()
     cur = src.cursor()
 
     try:
-        cur.execute("""
-            SELECT table_name, column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = %s
-            ORDER BY table_name, ordinal_position
-        """, (SCHEMA_NAME,))
+        cur.execute(SCHEMA_COLUMNS_SQL, (SCHEMA_NAME,))
         columns = cur.fetchall()
 
-        points: List[PointStruct] = []
-        id_counter = 1
+        texts: List[str] = []
+        payloads: List[Dict[str, Any]] = []
 
         for table_name, column_name, data_type in columns:
-            try:
-                schema_text = f"{table_name} table {column_name} column type {data_type}"
-                emb = EMBEDDING_MODEL.encode([schema_text])[0]
-                payload = {
-                    "table_name": table_name,
-                    "column_name": column_name,
-                    "data_type": data_type,
-                    "schema_text": schema_text,
-                    "embedding_type": "semantic_schema",
-                }
-                points.append(PointStruct(id=id_counter, vector=emb.tolist(), payload=payload))
-                id_counter += 1
+            schema_text = f"{table_name} table {column_name} column type {data_type}"
+            texts.append(schema_text)
+            payloads.append({
+                "table_name": table_name,
+                "column_name": column_name,
+                "data_type": data_type,
+                "schema_text": schema_text,
+                "embedding_type": "semantic_schema",
+            })
+
+        next_id = embed_and_upload(
+            client, settings.QDRANT_SCHEMA_COLLECTION, texts, payloads,
+            first_id=1, batch_size=batch_size, label="schema embedding"
+        )
 
-                if len(points) >= batch_size:
-                    client.upsert(collection_name=settings.QDRANT_SCHEMA_COLLECTION, points=points)
-                    print(f"Uploaded {len(points)} schema embedding points")
-                    points = []
+        print(f"Schema embeddings complete: {next_id-1} vectors")
 
-            except Exception as e:
-                print(f"Warning: could not embed {table_name}.{column_name}: {e}")
-                continue
+    finally:
+        cur.close()
+        _release_source_conn(src, owns_conn)
 
-        if points:
-            client.upsert(collection_name=settings.QDRANT_SCHEMA_COLLECTION, points=points)
-            print(f"Uploaded {len(points)} schema embedding points (final)")
 
-        print(f"Schema embeddings complete: {id_counter-1} vectors")
+# ------------------ Data samples (semantic) ------------------
 
+def _fetch_column_samples(src, table: str, col_name: str, max_samples_per_column: int) -> List[str]:
+    """DISTINCT non-null samples of a single column (fallback path, one query per column)."""
+    cur = src.cursor()
+    try:
+        # Use quoted identifiers to handle case-sensitive table/column names
+        cur.execute(
+            f'SELECT DISTINCT "{col_name}"::TEXT FROM "{SCHEMA_NAME}"."{table}" WHERE "{col_name}" IS NOT NULL LIMIT %s',
+            (max_samples_per_column,),
+        )
+        return [r[0] for r in cur.fetchall() if r[0]]
     finally:
         cur.close()
-        src.close()
 
 
-# ------------------ Data samples (semantic) ------------------
+def _fetch_table_samples(src, table: str, col_names: List[str], max_samples_per_column: int) -> Dict[str, List[str]]:
+    """DISTINCT non-null samples for all text columns of a table in one round trip.
+
+    One UNION ALL query (a DISTINCT ... LIMIT branch per column, tagged with the column
+    index) read through a server-side cursor. If the combined query fails (e.g. one
+    column is not readable), falls back to querying the columns one by one.
+    """
+    samples: Dict[str, List[str]] = {col_name: [] for col_name in col_names}
+    branches = [
+        f'SELECT {i} AS col_idx, v FROM (SELECT DISTINCT "{col_name}"::TEXT AS v '
+        f'FROM "{SCHEMA_NAME}"."{table}" WHERE "{col_name}" IS NOT NULL LIMIT %s) AS s{i}'
+        for i, col_name in enumerate(col_names)
+    ]
+    cur = src.cursor(name=f"samples_{table}"[:63])
+    cur.itersize = 1000
+    try:
+        cur.execute(" UNION ALL ".join(branches), (max_samples_per_column,) * len(col_names))
+        for col_idx, value in cur:
+            if value:
+                samples[col_names[col_idx]].append(value)
+        cur.close()
+        return samples
+    except Exception as e:
+        print(f"Warning: combined sampling failed for {table} ({e}); sampling columns one by one")
+        try:
+            src.rollback()
+        except Exception:
+            pass
+
+    for col_name in col_names:
+        try:
+            samples[col_name] = _fetch_column_samples(src, table, col_name, max_samples_per_column)
+        except Exception as e:
+            print(f"Warning: could not sample {table}.{col_name}: {e}")
+            try:
+                src.rollback()
+            except Exception:
+                pass
+    return samples
 
-def build_data_samples(client: QdrantClient, max_samples_per_column: int = 100, batch_size: int = BATCH_SIZE):
+
+def build_data_samples(client: QdrantClient, max_samples_per_column: int = 100, batch_size: int = BATCH_SIZE,
+                       src=None):
     """Extracts text samples from string/text columns and uploads semantic embeddings to Qdrant."""
     print("Building data samples (semantic)")
 
-    src = get_source_conn()
+    owns_conn = src is None  # called standalone: open (and close) a connection of our own
+    if owns_conn:
+        src = get_source_conn()
     cur = src.cursor()
 
     try:
-        cur.execute(
-            """
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_schema = %s
-              AND table_type = 'BASE TABLE'
-            """,
-            (SCHEMA_NAME,),
-        )
+        cur.execute(SCHEMA_TABLES_SQL, (SCHEMA_NAME,))
         tables = [r[0] for r in cur.fetchall()]
 
-        points: List[PointStruct] = []
-        id_counter = 1
+        # Text columns of every table in one query (instead of one query per table)
+        cur.execute(SCHEMA_COLUMNS_SQL, (SCHEMA_NAME,))
+        schema_columns = cur.fetchall()
+
+        # Flag-like columns ('Y'/'N', single-char codes) would only yield a few near-identical
+        # samples; skip them up front using the planner's statistics instead of scanning them
+        cur.execute(COLUMN_STATS_SQL, (SCHEMA_NAME,))
+        low_value_columns = {
+            (table, col_name)
+            for table, col_name, n_distinct, avg_width in cur.fetchall()
+            if (n_distinct is not None and 0 < n_distinct < DATA_SAMPLE_MIN_DISTINCT)
+            or (avg_width is not None and avg_width < DATA_SAMPLE_MIN_WIDTH)
+        }
+
+        text_columns_by_table: Dict[str, List[str]] = {}
+        skipped_columns = 0
+        for table, col_name, data_type in schema_columns:
+            data_type = str(data_type).lower()
+            if 'char' in data_type or 'text' in data_type:
+                if (table, col_name) in low_value_columns:
+                    skipped_columns += 1
+                    continue
+                text_columns_by_table.setdefault(table, []).append(col_name)
+        if skipped_columns:
+            print(f"Skipping {skipped_columns} low-cardinality / very short text columns (pg_stats)")
+
+        # Samples are encoded in chunks of DATA_SAMPLE_ENCODE_CHUNK texts: large enough for
+        # full model batches, small enough that a big schema never holds every vector at once
+        texts: List[str] = []
+        payloads: List[Dict[str, Any]] = []
+        next_id = 1
 
         ignore_tables = {"schema_embeddings", "schema_keywords", "data_samples", "lexical_embeddings"}
 
         for table in tables:
-            if table in ignore_tables:
+            if table in ignore_tables or table not in text_columns_by_table:
                 continue
 
-            cur.execute(
-                """
-                SELECT column_name, data_type
-                FROM information_schema.columns
-                WHERE table_name = %s AND table_schema = %s
-                ORDER BY ordinal_position
-                """,
-                (table, SCHEMA_NAME),
-            )
-            cols = cur.fetchall()
-
-            for col_name, data_type in cols:
-                if 'char' not in str(data_type).lower() and 'text' not in str(data_type).lower():
-                    continue
-
-                try:
-                    # Use quoted identifiers to handle case-sensitive table/column names
-                    cur.execute(
-                        f'SELECT DISTINCT "{col_name}"::TEXT FROM "{SCHEMA_NAME}"."{table}" WHERE "{col_name}" IS NOT NULL LIMIT %s',
-                        (max_samples_per_column,),
-                    )
-                    samples = [r[0] for r in cur.fetchall() if r[0]]
-
-                    for sample in samples:
-                        if len(sample) > 200:
-                            continue
-                        text = f"{sample} value in {table}.{col_name}"
-                        emb = EMBEDDING_MODEL.encode([text])[0]
-                        payload = {
-                            "table_name": table,
-                            "column_name": col_name,
-                            "sample_value": sample,
-                            "value_type": 'text',
-                            "embedding_type": "semantic_value",
-                        }
-                        points.append(PointStruct(id=id_counter, vector=emb.tolist(), payload=payload))
-                        id_counter += 1
-
-                        if len(points) >= batch_size:
-                            client.upsert(collection_name=settings.QDRANT_DATA_SAMPLES_COLLECTION, points=points)
-                            print(f"Uploaded {len(points)} data sample points")
-                            points = []
-
-                except Exception as e:
-                    print(f"Warning: could not sample {table}.{col_name}: {e}")
-                    try:
-                        src.rollback()
-                    except Exception:
-                        pass
-                    continue
-
-        if points:
-            client.upsert(collection_name="data_samples", points=points)
-            print(f"Uploaded {len(points)} data sample points (final)")
+            col_names = text_columns_by_table[table]
+            table_samples = _fetch_table_samples(src, table, col_names, max_samples_per_column)
+
+            for col_name in col_names:
+                for sample in table_samples[col_name]:
+                    if len(sample) > 200:
+                        continue
+                    texts.append(f"{sample} value in {table}.{col_name}")
+                    payloads.append({
+                        "table_name": table,
+                        "column_name": col_name,
+                        "sample_value": sample,
+                        "value_type": 'text',
+                        "embedding_type": "semantic_value",
+                    })
+
+            if len(texts) >= DATA_SAMPLE_ENCODE_CHUNK:
+                next_id = embed_and_upload(
+                    client, settings.QDRANT_DATA_SAMPLES_COLLECTION, texts, payloads,
+                    first_id=next_id, batch_size=batch_size, label="data sample"
+                )
+                texts, payloads = [], []
+
+        next_id = embed_and_upload(
+            client, settings.QDRANT_DATA_SAMPLES_COLLECTION, texts, payloads,
+            first_id=next_id, batch_size=batch_size, label="data sample"
+        )
 
-        print(f"Data samples complete: {id_counter-1} vectors")
+        print(f"Data samples complete: {next_id-1} vectors")
 
     finally:
         cur.close()
-        src.close()
+        _release_source_conn(src, owns_conn)
 
 
 # ------------------ Main pipeline ------------------
@@ -533,16 +763,24 @@ def build_data_samples(client: QdrantClient, max_samples_per_column: int = 100,
 def main():
     client = get_qdrant_client()
 
-    # 1) Create collections (lexical size will be adjusted later during lexical build)
+    # 1) Create collections
     create_qdrant_collections(client)
 
-    # 2) Build semantic schema embeddings
-    build_schema_embeddings(client) 
-    
-    # 3) Build lexical embeddings (this will adjust lexical collection size if needed)
-    build_lexical_embeddings(client)
+    # One read-only source connection for every step that reads the database
+    src = get_build_conn()
+    try:
+        # 2) Build semantic schema embeddings
+        build_schema_embeddings(client, src=src)
+
+        # 3) Build lexical embeddings
+        build_lexical_embeddings(client, src=src)
 
-    # 4) Load user-supplied schema keywords from external file and build them
+        # 4) Build data samples (the keywords step below reads a file, not the database)
+        build_data_samples(client, max_samples_per_column=100, src=src)
+    finally:
+        src.close()
+
+    # 5) Load user-supplied schema keywords from external file and build them
     loaded_schema_keywords = load_schema_keywords()
 
     SCHEMA_KEYWORDS_EXAMPLE = {
@@ -603,9 +841,6 @@ def main():
 
     build_schema_keywords(client, schema_keywords_to_use)
 
-    # 5) Build data samples
-    build_data_samples(client, max_samples_per_column=100)
-
     print("All embeddings created: semantic (schema_embeddings, schema_keywords, data_samples) and lexical (lexical_embeddings)")
 
 
@@ -1,3 +1,6 @@
+import atexit
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 from typing import Optional
 from qdrant_client import QdrantClient
@@ -18,24 +21,32 @@ class Settings(BaseSettings):
     DB_PORT: int = 5432
     DB_NAME: str = "defaultdb"
     DB_SCHEMA: str = "defaultschema"
+    DB_POOL_MIN: int = 4  # Connections opened up front by the query pool
+    DB_POOL_MAX: int = 32  # Upper bound on concurrent backend connections
+    RESULT_MAX_ROWS: int = 10000  # Rows fetched per query; larger results are cut off
+    RESULT_FETCH_BATCH: int = 2000  # Rows pulled per round trip from the server-side cursor
 
     # Qdrant
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
     QDRANT_API_KEY: Optional[str] = None
     QDRANT_USE_GRPC: bool = False
+    QDRANT_POOL_SIZE: int = 100  # Pooled HTTP/gRPC connections shared by concurrent searches and upserts
+    QDRANT_SCALAR_QUANTIZATION: bool = True  # int8 quantization for the semantic collections (build_vectorDB)
     
     # Qdrant Collection Names
     QDRANT_SCHEMA_COLLECTION: str = "schema_embeddings"
     QDRANT_KEYWORDS_COLLECTION: str = "schema_keywords"
     QDRANT_DATA_SAMPLES_COLLECTION: str = "data_samples"
     QDRANT_LEXICAL_COLLECTION: str = "lexical_embeddings"
+    QDRANT_LEXICAL_VECTOR_NAME: str = "tfidf"  # Named sparse vector holding the TF-IDF weights
 
     # Models
     EMBEDDING_MODEL_NAME: str = "emrecan/bert-base-turkish-cased-mean-nli-stsb-tr"
     SEMANTIC_MODEL_NAME: Optional[str] = None
     LEXICAL_FASTTEXT_PATH: str = "./models/fasttext_lexical_model.model"
     TFIDF_VECTORIZER_PATH: str = "./models/tfidf_vectorizer.joblib"
+    EMBEDDING_CACHE_DIR: str = "./models/sentence_transformers"  # Local safetensors copies of the embedding models ("" = off)
 
     # LLM
     LLM_MODEL_PATH: str = "./models/OpenR1-Qwen-7B-Turkish-Q4_K_M.gguf"
@@ -44,10 +55,14 @@ class Settings(BaseSettings):
     LLM_N_BATCH: int = 512  
     LLM_LOW_VRAM: bool = False
     LLM_VERBOSE: bool = False
+    LLM_STATE_CACHE_DIR: str = "./cache"  # Saved KV state of the primed static prompt, restored at startup ("" = off)
     
     # GPU Settings (automatic detection if not specified)
     USE_GPU: Optional[bool] = True  # GPU'yu zorla kullan
     LLM_N_GPU_LAYERS: int = 35  # RTX 4060 için optimize (tümü yerine 35 katman)
+    EMBEDDING_FP16: bool = True  # Embedding modellerini GPU'da yarı hassasiyette (FP16) çalıştır
+    TORCH_NUM_THREADS: Optional[int] = None  # CPU'da PyTorch thread sayısı (boş = tüm çekirdekler)
+    EMBEDDING_ONNX: bool = False  # CPU'da embedding modellerini ONNX Runtime ile çalıştır (optimum[onnxruntime] gerekir)
 
     # App tuning
     MAX_PATH_HOPS: int = 2
@@ -56,8 +71,18 @@ class Settings(BaseSettings):
     # Vector & Embedding Settings
     SEMANTIC_VECTOR_SIZE: int = 768
     LEXICAL_VECTOR_SIZE: int = 1000
-    BATCH_SIZE: int = 128
+    BATCH_SIZE: int = 128  # Texts per embedding model forward pass
+    QDRANT_UPSERT_BATCH: int = 1024  # Points per Qdrant upsert request when building the vector DB
     
+    # API session cache (one generator per session_id)
+    SESSION_CACHE_MAX: int = 1024  # Max live sessions; least recently used are evicted
+    SESSION_TTL_SECONDS: int = 3600  # Idle sessions older than this are dropped
+
+    # Semantic SQL cache (paraphrased questions reuse SQL generated earlier, across sessions)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_MAX: int = 10000  # Max cached questions; least recently used are evicted
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Min cosine similarity between question embeddings
+
     # Search Thresholds
     SEMANTIC_THRESHOLD: float = 0.5
     LEXICAL_THRESHOLD: float = 0.4
@@ -67,11 +92,16 @@ class Settings(BaseSettings):
     # If set to true (or 1), skip loading the local LLM model (useful for testing)
     SKIP_LLM: bool = False
 
+    # If set to true (or 1), print the full dynamic prompt for every query (debugging only)
+    TEXT2SQL_DEBUG: bool = False
+
 
 settings = Settings()
 
 
+@lru_cache(maxsize=1)
 def create_qdrant_client():
+    """Process-wide Qdrant client; every caller shares its connection pool."""
     kwargs = {}
     if settings.QDRANT_API_KEY:
         kwargs["api_key"] = settings.QDRANT_API_KEY
@@ -80,6 +110,16 @@ def create_qdrant_client():
     # HTTP-only Qdrant server (which causes WRONG_VERSION_NUMBER errors).
     url = f"http://{settings.QDRANT_HOST}:{settings.QDRANT_PORT}"
     try:
+        return QdrantClient(
+            url=url,
+            prefer_grpc=settings.QDRANT_USE_GRPC,
+            pool_size=settings.QDRANT_POOL_SIZE,
+            **kwargs,
+        )
+    except TypeError:
+        pass
+    try:
+        # Older qdrant-client versions may not accept `pool_size`
         return QdrantClient(
             url=url,
             prefer_grpc=settings.QDRANT_USE_GRPC,
@@ -98,6 +138,18 @@ def create_qdrant_client():
             )
 
 
+def _close_qdrant_client():
+    """Close the pooled connections at interpreter exit (only if a client was created)."""
+    if create_qdrant_client.cache_info().currsize:
+        try:
+            create_qdrant_client().close()
+        except Exception:
+            pass
+
+
+atexit.register(_close_qdrant_client)
+
+
 def get_db_conn_kwargs():
     return {
         "user": settings.DB_USER,
@@ -2,9 +2,10 @@
 Core module - Business logic layer
 """
 
-from .llm_manager import get_llm_instance, create_fallback_llm, prime_static_prompt_once, STATIC_PROMPT
+from .llm_manager import get_llm_instance, create_fallback_llm, prime_static_prompt_once, STATIC_PROMPT, LLM_LOCK
 from .prompt_builder import generate_strict_prompt_dynamic_only, ensure_static_session
 from .error_analyzer import SQLErrorAnalyzer
+from .semantic_cache import SemanticSQLCache, get_semantic_cache
 from .sql_generator import InteractiveSQLGenerator
 
 __all__ = [
@@ -12,8 +13,11 @@ __all__ = [
     'create_fallback_llm',
     'prime_static_prompt_once',
     'STATIC_PROMPT',
+    'LLM_LOCK',
     'generate_strict_prompt_dynamic_only',
     'ensure_static_session',
     'SQLErrorAnalyzer',
+    'SemanticSQLCache',
+    'get_semantic_cache',
     'InteractiveSQLGenerator',
 ]
@@ -5,6 +5,16 @@ Error Analyzer - SQL error analysis and suggestions
 import re
 from typing import Dict, List
 
+from rapidfuzz import fuzz, process
+
+MAX_SUGGESTIONS = 5  # per suggestion list
+SUGGESTION_SCORE_CUTOFF = 60  # minimum rapidfuzz WRatio (0-100) for a name to be suggested
+
+# Quoted values / identifiers in PostgreSQL error messages, compiled once
+_QUOTED_RE = re.compile(r"\"([^\"]+)\"")
+_TABLE_NAME_RE = re.compile(r"table \"([^\"]+)\"", re.IGNORECASE)
+_COLUMN_NAME_RE = re.compile(r"column \"([^\"]+)\"", re.IGNORECASE)
+
 
 class SQLErrorAnalyzer:
     """SQL error analysis helper - ENHANCED VERSION"""
@@ -63,7 +73,7 @@ class SQLErrorAnalyzer:
     def _extract_timestamp_value(self, error_message: str) -> List[str]:
         """Extract values from a timestamp error message."""
         # Find invalid values like "asdaba"
-        matches = re.findall(r"\"([^\"]+)\"", error_message)
+        matches = _QUOTED_RE.findall(error_message)
         return matches if matches else []
     
     def _suggest_timestamp_fixes(self, error_message: str, sql_query: str) -> List[Dict]:
@@ -115,53 +125,77 @@ class SQLErrorAnalyzer:
     
     def _extract_table_name(self, error_message: str) -> List[str]:
         """Extract table name from an error message."""
-        matches = re.findall(r"table \"([^\"]+)\"", error_message, re.IGNORECASE)
+        matches = _TABLE_NAME_RE.findall(error_message)
         return matches if matches else []
     
     def _extract_column_name(self, error_message: str) -> List[str]:
         """Extract column name from an error message."""
-        matches = re.findall(r"column \"([^\"]+)\"", error_message, re.IGNORECASE)
+        matches = _COLUMN_NAME_RE.findall(error_message)
         return matches if matches else []
     
     def _suggest_tables(self, schema_pool: Dict, error_message: str) -> List[Dict]:
         """Create table suggestions based on schema pool."""
         problematic_tables = self._extract_table_name(error_message)
-        suggestions = []
+        if not problematic_tables:
+            return []
         
+        # Lowercase every pool table once; each problematic name is scored against all
+        # of them in one rapidfuzz call (WRatio also rates substrings and typos)
+        pool = list(schema_pool.keys())
+        pool_lc = [existing_table.lower() for existing_table in pool]
+        
+        best = {}  # pool index -> best score over all problematic names
         for table in problematic_tables:
-            for existing_table in schema_pool.keys():
-                # Simple similarity check
-                if table.lower() in existing_table.lower() or existing_table.lower() in table.lower():
-                    suggestions.append({
-                        "suggested": existing_table,
-                        "confidence": 80,
-                        "reason": "Similar table name"
-                    })
+            for _, score, idx in process.extract(
+                table.lower(), pool_lc, scorer=fuzz.WRatio,
+                limit=MAX_SUGGESTIONS, score_cutoff=SUGGESTION_SCORE_CUTOFF
+            ):
+                best[idx] = max(score, best.get(idx, 0))
         
-        return suggestions[:5]
+        ranked = sorted(best.items(), key=lambda item: -item[1])[:MAX_SUGGESTIONS]
+        return [
+            {
+                "suggested": pool[idx],
+                "confidence": round(score),
+                "reason": "Similar table name"
+            }
+            for idx, score in ranked
+        ]
     
     def _suggest_columns(self, schema_pool: Dict, error_message: str) -> List[Dict]:
         """Create column suggestions based on schema pool."""
         problematic_columns = self._extract_column_name(error_message)
-        suggestions = []
+        if not problematic_columns:
+            return []
         
+        # Flatten every (table, column) pair once, with the lowercased column names
+        # as the rapidfuzz candidates
+        pool = []
+        for table, table_data in schema_pool.items():
+            # Handle both dict and list formats
+            columns = []
+            if isinstance(table_data, dict):
+                columns = table_data.get('columns', [])
+            elif isinstance(table_data, list):
+                columns = table_data
+            pool.extend((table, existing_column) for existing_column in columns)
+        pool_lc = [existing_column.lower() for _, existing_column in pool]
+        
+        best = {}  # pool index -> best score over all problematic names
         for column in problematic_columns:
-            for table, table_data in schema_pool.items():
-                # Handle both dict and list formats
-                columns = []
-                if isinstance(table_data, dict):
-                    columns = table_data.get('columns', [])
-                elif isinstance(table_data, list):
-                    columns = table_data
-                    
-                for existing_column in columns:
-                    # Simple similarity check
-                    if column.lower() in existing_column.lower() or existing_column.lower() in column.lower():
-                        suggestions.append({
-                            "suggested": existing_column,
-                            "table": table,
-                            "confidence": 80,
-                            "reason": "Similar column name"
-                        })
+            for _, score, idx in process.extract(
+                column.lower(), pool_lc, scorer=fuzz.WRatio,
+                limit=MAX_SUGGESTIONS, score_cutoff=SUGGESTION_SCORE_CUTOFF
+            ):
+                best[idx] = max(score, best.get(idx, 0))
         
-        return suggestions[:5]
+        ranked = sorted(best.items(), key=lambda item: -item[1])[:MAX_SUGGESTIONS]
+        return [
+            {
+                "suggested": pool[idx][1],
+                "table": pool[idx][0],
+                "confidence": round(score),
+                "reason": "Similar column name"
+            }
+            for idx, score in ranked
+        ]
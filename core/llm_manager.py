@@ -2,15 +2,24 @@
 LLM Manager - Singleton LLM instance management
 """
 
+import glob
+import hashlib
 import os
+import pickle
+import threading
 from llama_cpp import Llama
 from typing import Optional
 
 # Global cache for LLM instance
-_STATIC_PROMPT_PRIMED = False
+# (whether STATIC_PROMPT is in the KV cache is tracked on the instance itself, as
+# its `_static_prompt_primed` attribute, so every priming entry point sees one flag)
 _LLM_INSTANCE: Optional[Llama] = None
 _LLM_LOADED = False  # Flag to track if LLM was attempted to load
 
+# The singleton llama.cpp context is not thread-safe; API requests run on worker
+# threads, so every completion call on the shared instance goes through this lock
+LLM_LOCK = threading.Lock()
+
 # Static prompt - EXPANDED WITH ALL CRITICAL RULES (loaded once to KV cache)
 STATIC_PROMPT = """Sen PostgreSQL uzmanısın. Türkçe soruyu SQL'e çevir.
 
@@ -174,11 +183,100 @@ SELECT * FROM TABLO1;
 """
 
 
+def _static_state_path(settings) -> Optional[str]:
+    """
+    File holding the KV state after STATIC_PROMPT was primed, or None when disabled.
+
+    The name hashes everything the saved state depends on (prompt text, model file,
+    context/batch sizes); any change yields a new name, so a stale state is never loaded.
+    """
+    if not settings.LLM_STATE_CACHE_DIR:
+        return None
+    try:
+        model_stat = os.stat(settings.LLM_MODEL_PATH)
+    except OSError:
+        return None
+    key = "\0".join([
+        STATIC_PROMPT,
+        os.path.abspath(settings.LLM_MODEL_PATH),
+        str(model_stat.st_size),
+        str(model_stat.st_mtime_ns),
+        str(settings.LLM_N_CTX),
+        str(settings.LLM_N_BATCH),
+    ])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(settings.LLM_STATE_CACHE_DIR, f"kv_{digest}.pkl")
+
+
+def _restore_static_state(llm: Llama, path: str) -> bool:
+    """Load a saved static-prompt KV state into `llm`; False if missing or unreadable."""
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, "rb") as f:
+            llm.load_state(pickle.load(f))
+        return True
+    except Exception as e:
+        print(f"⚠️ KV state yüklenemedi ({e}); statik prompt yeniden işlenecek")
+        return False
+
+
+def _save_static_state(llm: Llama, path: str):
+    """Persist the primed KV state (atomic write) and drop states saved for older prompts/models."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(llm.save_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        for old_path in glob.glob(os.path.join(os.path.dirname(path), "kv_*.pkl")):
+            if old_path != path:
+                os.remove(old_path)
+        print(f"💾 Statik prompt KV state kaydedildi: {path}")
+    except Exception as e:
+        print(f"⚠️ KV state kaydedilemedi: {e}")
+
+
+def _prime_static_prompt(llm_inst) -> None:
+    """
+    Put STATIC_PROMPT into the KV cache of `llm_inst` exactly once.
+
+    The single priming path used by get_llm_instance(), prime_static_prompt_once() and
+    ensure_static_session(): restores the saved KV state when one matches, otherwise
+    runs the prefill and saves it. Failures are not critical - queries still work, they
+    just process the static prompt themselves.
+    """
+    if llm_inst is None or getattr(llm_inst, "_static_prompt_primed", False):
+        return
+
+    from config import settings
+
+    with LLM_LOCK:
+        if getattr(llm_inst, "_static_prompt_primed", False):
+            return
+        state_path = _static_state_path(settings) if isinstance(llm_inst, Llama) else None
+        if state_path and _restore_static_state(llm_inst, state_path):
+            # Kaydedilmiş KV state geri yüklendi: prefill hiç çalışmaz
+            print("✅ Statik prompt KV Cache diskten geri yüklendi.")
+        else:
+            print("⏳ KV Cache Warming: Statik prompt hafızaya işleniyor...")
+            try:
+                # Statik promptu bir kez işleterek KV cache'e alınmasını sağlıyoruz
+                llm_inst(STATIC_PROMPT, max_tokens=1, temperature=0)
+                print("✅ Statik prompt KV Cache'e kilitlendi.")
+                if state_path:
+                    _save_static_state(llm_inst, state_path)
+            except Exception as e:
+                print(f"⚠️ Priming error: {e}")
+        # Mark so priming is not repeated (also after a failure)
+        setattr(llm_inst, "_static_prompt_primed", True)
+
+
 def get_llm_instance() -> Llama:
     """
     Manage the LLM instance as a singleton with Static Prompt Priming.
     """
-    global _LLM_INSTANCE, _LLM_LOADED, _STATIC_PROMPT_PRIMED
+    global _LLM_INSTANCE, _LLM_LOADED
     
     if _LLM_INSTANCE is not None:
         return _LLM_INSTANCE
@@ -203,16 +301,7 @@ def get_llm_instance() -> Llama:
         print("✅ LLM ready!")
 
         # STATIK PROMPT CACHELEME (PRIMING)
-        if not _STATIC_PROMPT_PRIMED:
-            print("⏳ KV Cache Warming: Statik prompt hafızaya işleniyor...")
-            # Statik promptu bir kez işleterek KV cache'e alınmasını sağlıyoruz
-            _LLM_INSTANCE.create_completion(
-                STATIC_PROMPT,
-                max_tokens=1,
-                temperature=0
-            )
-            _STATIC_PROMPT_PRIMED = True
-            print("✅ Statik prompt KV Cache'e kilitlendi.")
+        _prime_static_prompt(_LLM_INSTANCE)
         
     except Exception as e:
         print(f"❌ LLM load error: {e}")
@@ -244,17 +333,5 @@ def create_fallback_llm():
 
 
 def prime_static_prompt_once():
-    """Prime the static prompt only once - UPDATED"""
-    global _STATIC_PROMPT_PRIMED, _LLM_INSTANCE
-    
-    if not _STATIC_PROMPT_PRIMED and _LLM_INSTANCE is not None:
-        print("⏳ Starting static prompt priming...")
-        try:
-            # Prime with full static prompt
-            _LLM_INSTANCE(STATIC_PROMPT, max_tokens=1, temperature=0)
-            _STATIC_PROMPT_PRIMED = True
-            print("✅ Static prompt priming complete.")
-        except Exception as e:
-            print(f"⚠️ Priming error: {e}")
-            # Priming failure is not critical; continue
-            _STATIC_PROMPT_PRIMED = True
+    """Prime the static prompt of the loaded LLM (no-op if already primed or not loaded)."""
+    _prime_static_prompt(_LLM_INSTANCE)
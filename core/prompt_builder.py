@@ -3,13 +3,14 @@ Prompt Builder - Build prompts for LLM SQL generation
 """
 
 import os
-from .llm_manager import get_llm_instance, STATIC_PROMPT
+from .llm_manager import get_llm_instance, _prime_static_prompt
 
 
 def ensure_static_session():
     """
     Load the static prompt into the model's KV cache.
-    Uses in-memory caching when no session file is available.
+    get_llm_instance() already primes on first load; this only loads the LLM if needed
+    and shares the same once-only priming path, so it never runs a second prefill.
     """
     # If LLM explicitly disabled, skip priming
     if os.environ.get('SKIP_LLM') == '1':
@@ -24,43 +25,31 @@ def ensure_static_session():
         print(f"⚠️ Could not get LLM instance for priming: {e}")
         return
 
-    if getattr(llm_inst, "_static_prompt_primed", False):
-        return
+    _prime_static_prompt(llm_inst)
 
-    print("⏳ Starting static prompt priming...")
-    try:
-        # Method 1: Minimal token generation priming
-        llm_inst(STATIC_PROMPT, max_tokens=1, temperature=0)
 
-    except Exception as e:
-        print(f"⚠️ Priming error: {e}")
-        # Continue even if priming fails
-        print("⚠️ Continuing without cache...")
+# Explicit filtering indicators (matched as substrings of the lowercased query)
+_FILTER_INDICATORS = frozenset({
+    'olan', 'filtrele', 'bul', 'göster', 'getir', 'listele',
+    'hangi', 'nerede', 'kaç', 'kim', 'ne zaman',
+    'aktif', 'pasif', 'büyük', 'küçük', 'eşit', 'arası', 'içinde', 'musun', 'misin', 'mu', 'mü', 'var mı', 'yok mu', 'var'
+})
 
-    # Mark so priming is not repeated
-    setattr(llm_inst, "_static_prompt_primed", True)
-    print("✅ Static prompt priming complete (in-memory cache).")
+# Explicit value indicators (quotes, comparison operators)
+_EXPLICIT_VALUE_SYMBOLS = ('"', "'", "=", ">", "<")
 
 
 def _needs_explicit_filtering(natural_query: str) -> bool:
     """Return True if the user's query contains explicit filtering indicators."""
     query_lower = natural_query.lower()
     
-    # Explicit filtering indicators
-    filter_indicators = [
-        'olan', 'filtrele', 'bul', 'göster', 'getir', 'listele', 
-        'hangi', 'nerede', 'kaç', 'kim', 'ne zaman',
-        'aktif', 'pasif', 'büyük', 'küçük', 'eşit', 'arası', 'içinde','musun','misin', 'mu','mü','var mı','yok mu','var'
-    ]
-    
-    # Explicit value indicators (numbers, proper names)
-    has_explicit_value = any([
-        any(word.isdigit() for word in natural_query.split()),
-        any(indicator in query_lower for indicator in ['"', "'", "=", ">", "<"])
-    ])
+    # Explicit value indicators (symbols, numbers) first: cheapest checks, most decisive
+    if any(symbol in query_lower for symbol in _EXPLICIT_VALUE_SYMBOLS):
+        return True
+    if any(word.isdigit() for word in query_lower.split()):
+        return True
     
-    return (any(indicator in query_lower for indicator in filter_indicators) 
-            or has_explicit_value)
+    return any(indicator in query_lower for indicator in _FILTER_INDICATORS)
 
 
 def generate_strict_prompt_dynamic_only(
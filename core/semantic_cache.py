@@ -0,0 +1,138 @@
+"""
+Semantic SQL Cache - Reuse generated SQL for paraphrased questions
+Stores (question embedding -> SQL) for successful queries; a new question whose
+embedding is close enough to a cached one skips hybrid search and the LLM.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config import settings
+
+
+# Literals a question pins its SQL to: numbers (years, ids, amounts) and quoted values.
+# Quotes must stand at word boundaries so Turkish suffix apostrophes (İstanbul'da) don't pair up.
+_LITERAL_RE = re.compile(r'\d+(?:[.,]\d+)*|"([^"]+)"|“([^”]+)”|(?<!\w)\'([^\']+)\'(?!\w)')
+
+
+def extract_literals(question: str) -> Tuple[str, ...]:
+    """Numeric and quoted literals of a question, order-insensitive (sorted)."""
+    literals = []
+    for match in _LITERAL_RE.finditer(question):
+        quoted = match.group(1) or match.group(2) or match.group(3)
+        literals.append(quoted.strip().lower() if quoted is not None else match.group(0))
+    return tuple(sorted(literals))
+
+
+class SemanticSQLCache:
+    """
+    Thread-safe, bounded LRU cache of question embeddings -> SQL.
+
+    Embeddings live in one preallocated float32 matrix, so a lookup is a single
+    matrix-vector product over the live rows. Every entry carries a context key
+    (hash of the conversation context the SQL was generated under); lookups only
+    match entries with the same context, so a follow-up question is never answered
+    with SQL that was written for a different conversation.
+
+    Entries also carry the question's literals (extract_literals). Sentence embeddings
+    score "2023 satışları" and "2024 satışları" as near-identical, but the cached SQL
+    hard-codes 2023, so only entries with exactly the same literals can match.
+    """
+
+    def __init__(self, maxsize: int = 10000, threshold: float = 0.92):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._vectors = None  # (maxsize, dim) float32, allocated on first insert
+        self._contexts = np.zeros(maxsize, dtype=np.int64)
+        self._literal_keys = np.zeros(maxsize, dtype=np.int64)  # hash of each entry's literals
+        self._used = np.zeros(maxsize, dtype=bool)
+        self._entries = OrderedDict()  # slot -> (question, sql), LRU order
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    @staticmethod
+    def _literal_key(question: str) -> int:
+        return hash(extract_literals(question))
+
+    def _best_match(self, vec: np.ndarray, context_key: int, literal_key: int) -> Tuple[int, float]:
+        """Return (slot, cosine similarity) of the closest entry with this context and literals, or (-1, -1.0)."""
+        if self._vectors is None or not self._entries:
+            return -1, -1.0
+        sims = self._vectors @ vec
+        sims[~self._used | (self._contexts != context_key) | (self._literal_keys != literal_key)] = -1.0
+        slot = int(np.argmax(sims))
+        return slot, float(sims[slot])
+
+    def lookup(self, embedding, context_key: int, question: str) -> Optional[Tuple[str, str, float]]:
+        """Return (cached question, sql, similarity) for a close enough question with the same literals, else None."""
+        vec = self._normalize(embedding)
+        literal_key = self._literal_key(question)
+        with self._lock:
+            slot, sim = self._best_match(vec, context_key, literal_key)
+            if slot < 0 or sim < self.threshold:
+                return None
+            self._entries.move_to_end(slot)
+            cached_question, sql = self._entries[slot]
+            return cached_question, sql, sim
+
+    def insert(self, embedding, context_key: int, question: str, sql: str):
+        """Cache `sql` for `question`; a near-identical question in the same context is overwritten."""
+        vec = self._normalize(embedding)
+        literal_key = self._literal_key(question)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vec.shape[0]), dtype=np.float32)
+            slot, sim = self._best_match(vec, context_key, literal_key)
+            if slot < 0 or sim < 0.999:
+                if len(self._entries) < self.maxsize:
+                    slot = int(np.argmin(self._used))  # first free slot
+                else:
+                    slot, _ = self._entries.popitem(last=False)  # reuse the LRU slot
+            self._vectors[slot] = vec
+            self._contexts[slot] = context_key
+            self._literal_keys[slot] = literal_key
+            self._used[slot] = True
+            self._entries[slot] = (question, sql)
+            self._entries.move_to_end(slot)
+
+    def discard(self, embedding, context_key: int, question: str):
+        """Drop the entry a lookup would return (e.g. its SQL no longer runs)."""
+        vec = self._normalize(embedding)
+        literal_key = self._literal_key(question)
+        with self._lock:
+            slot, sim = self._best_match(vec, context_key, literal_key)
+            if slot >= 0 and sim >= self.threshold:
+                self._used[slot] = False
+                del self._entries[slot]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_SEMANTIC_CACHE: Optional[SemanticSQLCache] = None
+_SEMANTIC_CACHE_LOCK = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticSQLCache]:
+    """Return the process-wide cache shared by all sessions (None when disabled)."""
+    global _SEMANTIC_CACHE
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    if _SEMANTIC_CACHE is None:
+        with _SEMANTIC_CACHE_LOCK:
+            if _SEMANTIC_CACHE is None:
+                _SEMANTIC_CACHE = SemanticSQLCache(
+                    maxsize=settings.SEMANTIC_CACHE_MAX,
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                )
+    return _SEMANTIC_CACHE
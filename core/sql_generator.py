@@ -4,7 +4,10 @@ SQL Generator - Interactive SQL generation with conversation history
 
 import time
 import re
-import sqlparse
+import contextlib
+import hashlib
+import threading
+from collections import OrderedDict, deque
 from typing import Dict, List, Optional, Set, Tuple
 
 from config import settings
@@ -29,14 +32,82 @@ from core import (
     get_llm_instance,
     generate_strict_prompt_dynamic_only,
     SQLErrorAnalyzer,
-    STATIC_PROMPT
+    STATIC_PROMPT,
+    LLM_LOCK,
+    get_semantic_cache
 )
 from schema.path_finder import _filter_maximal_paths
+from utils.models import get_semantic_model
 
 # Constants
 MAX_PATH_HOPS = settings.MAX_PATH_HOPS
 MAX_INITIAL_RESULTS = settings.MAX_INITIAL_RESULTS
 TOP_COLUMNS_IN_CONTEXT = 7  # Default value
+SQL_MAX_TOKENS = 256  # Decode budget per SQL; generation normally ends earlier at a stop token
+PROMPT_CACHE_SIZE = 256  # Max cached (dynamic_prompt, full_prompt) pairs per session
+LLM_CACHE_SIZE = 128  # Max cached raw LLM outputs per session
+# (temperature, top_p) per attempt: greedy first, then sampled variants so a
+# retry decodes a different candidate instead of repeating the failed one
+DECODING_VARIANTS = ((0, 0.9), (0.3, 0.95), (0.6, 0.95))
+
+# Stop sequences for SQL generation; a tuple so it can be part of the LLM cache key
+# (llama-cpp only honors a list or str, see _call_llm_cached)
+_LLM_STOP = (";", "Kullanıcı", "Açıklama", "```\n\n")
+
+# Precompiled table-reference pattern (FROM / JOIN clauses, optionally schema-qualified)
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+([a-zA-Z_][a-zA-Z0-9_.]*)', re.IGNORECASE)
+
+# Words that refer back to an earlier query ("bu", "önceki", ...), matched as whole words
+_REFERENCE_RE = re.compile(r'\b(?:bu|şu|önceki|yukarıdaki|aşağıdaki|bunu|şunu)\b', re.IGNORECASE)
+
+
+def _text_from_choice_dict(choice: Dict) -> str:
+    """Text of a dict choice: completion 'text' or chat 'message.content'."""
+    if 'text' in choice:
+        return choice['text']
+    message = choice.get('message')
+    if isinstance(message, dict):
+        return message.get('content') or ""
+    return ""
+
+
+def _text_from_dict_response(response: Dict) -> str:
+    """llama-cpp style dict response (the common case)."""
+    try:
+        choice = response["choices"][0]
+        if isinstance(choice, dict):
+            return _text_from_choice_dict(choice)
+    except (KeyError, IndexError, TypeError):
+        pass
+    for key in ('text', 'content', 'generated_text'):
+        if key in response:
+            return response[key]
+    return ""
+
+
+def _text_from_str_response(response: str) -> str:
+    return response
+
+
+def _text_from_object_response(response) -> str:
+    """Attribute-style response objects (e.g. OpenAI client results)."""
+    choices = getattr(response, 'choices', None)
+    if not choices:
+        return ""
+    choice = choices[0]
+    if isinstance(choice, dict):
+        return _text_from_choice_dict(choice)
+    text = getattr(choice, 'text', None)
+    if text is None:
+        text = getattr(getattr(choice, 'message', None), 'content', None)
+    return text or ""
+
+
+# Response type -> text extractor, filled lazily by _parse_llm_response
+_RESPONSE_EXTRACTORS = {
+    dict: _text_from_dict_response,
+    str: _text_from_str_response,
+}
 
 
 class InteractiveSQLGenerator:
@@ -46,7 +117,15 @@ class InteractiveSQLGenerator:
         self.error_analyzer = SQLErrorAnalyzer()
         self.max_retries = 3
         self.conversation_history = []
+        self._successful_sql_msgs = deque(maxlen=10)  # newest-first index of successful_sql messages
+        # Bumped whenever the user_query/successful_sql pairs in the history may change;
+        # the extended conversation context is reused across retries while it is unchanged
+        self._history_version = 0
+        self._extended_context_cache = (-1, "")
+        # Error analyses for the current turn: (error, SQL) -> (schema pool, analysis)
+        self._error_analysis_cache = {}
         self.current_schema_pool = {}  # store schema pool
+        self._schema_pool_query_key = None  # hash of the query current_schema_pool was built for
         self.llm = get_llm_instance()  # get LLM instance from global cache
         self.last_successful_query = None  # Remember successful queries
         self.conversation_context_window = 3  # window of last N conversations
@@ -55,6 +134,10 @@ class InteractiveSQLGenerator:
         self.query_similarity_cache = {}  # cache for query similarities
         self.previous_conversation_fk_cache = {}  # cache of previous conversation FK-PK paths
         self.dynamic_prompt_fk_cache = {}  # cache for FK paths in dynamic prompts
+        self.prompt_cache = OrderedDict()  # LRU cache: prompt inputs -> (dynamic_prompt, full_prompt)
+        self.llm_cache = OrderedDict()  # LRU cache: (prompt hash, sampling params) -> raw LLM text
+        self._llm_cache_lock = threading.Lock()  # /chat runs in a threadpool; sessions may overlap
+        self.debug = settings.TEXT2SQL_DEBUG  # verbose prompt dumps (off in production)
 
     def _make_fk_cache_keys(self, user_query: str, sql_content: Optional[str] = None) -> Tuple[str, Optional[str]]:
         """
@@ -70,13 +153,14 @@ class InteractiveSQLGenerator:
             print(f"🔍 [_make_fk_cache_keys] Key oluşturma hatası: {e}")
             return f"fk_simple_{hash(user_query)}", None
 
-    def _cache_current_fk_paths(self, natural_query: str, paths: Dict, sql_content: Optional[str] = None):
+    def _cache_current_fk_paths(self, natural_query: str, sorted_paths: List[Tuple[str, List[Dict]]],
+                                sql_content: Optional[str] = None):
         """Cache the FK paths for the current query (store under both simple and combo keys)."""
         try:
             if not hasattr(self, 'dynamic_prompt_fk_cache'):
                 self.dynamic_prompt_fk_cache = {}
 
-            fk_paths = self._format_fk_paths_like_previous_dynamic(paths)
+            fk_paths = self._format_fk_paths_like_previous_dynamic(sorted_paths)
             if not fk_paths:
                 # still write empty string under simple key (for future fallback)
                 simple_key, combo_key = self._make_fk_cache_keys(natural_query, sql_content or "")
@@ -97,17 +181,14 @@ class InteractiveSQLGenerator:
         except Exception as e:
             print(f"⚠️ [_cache_current_fk_paths] Cache yazma hatası: {e}")
 
-    def _format_fk_paths_like_previous_dynamic(self, paths: Dict[str, List[Dict]]) -> str:
-        """Format FK paths like previous dynamic prompt"""
-        if not paths:
+    def _format_fk_paths_like_previous_dynamic(self, sorted_paths: List[Tuple[str, List[Dict]]]) -> str:
+        """Format FK paths like previous dynamic prompt (expects maximal, key-sorted paths)"""
+        if not sorted_paths:
             return ""
 
-        # Filter: take only maximal chains
-        filtered_paths = _filter_maximal_paths(paths)
-
         relationship_lines = []
 
-        for path_key, hops in sorted(filtered_paths.items()):
+        for path_key, hops in sorted_paths:
             if not hops:
                 continue
 
@@ -131,6 +212,101 @@ class InteractiveSQLGenerator:
 
         return "\n".join(relationship_lines)
 
+    def _make_prompt_cache_key(self, natural_query: str, schema_pool: Dict,
+                               sorted_paths: List[Tuple[str, List[Dict]]], top_columns: List,
+                               value_context: Dict, conversation_context: str) -> Tuple:
+        """Build a hashable key covering every input of schema formatting and prompt generation."""
+        pool_key = tuple(
+            (table, tuple(
+                (col, (info.get('column_details', {}).get(col) or {}).get('data_type'))
+                for col in info.get('columns', [])
+            ))
+            for table, info in schema_pool.items()
+        )
+        paths_key = tuple(
+            (path_key, tuple(
+                (hop.get('fk_table') or hop.get('from'), hop.get('fk_column'),
+                 hop.get('pk_table') or hop.get('to'), hop.get('pk_column') or hop.get('ref_column'))
+                for hop in hops
+            ))
+            for path_key, hops in sorted_paths
+        )
+        columns_key = tuple((c.get('table'), c.get('column')) for c in top_columns or [])
+        values_key = tuple((k, tuple(v or [])) for k, v in (value_context or {}).items())
+        return (natural_query, pool_key, paths_key, columns_key, values_key, conversation_context)
+
+    def _build_prompt_cached(self, natural_query: str, schema_pool: Dict, paths: Dict,
+                             sorted_paths: List[Tuple[str, List[Dict]]], fk_graph: Dict,
+                             top_columns: List, value_context: Dict,
+                             conversation_context: str) -> Tuple[str, str]:
+        """
+        Return (dynamic_prompt, full_prompt), reusing the previous build for identical inputs.
+        full_prompt is STATIC_PROMPT + dynamic_prompt, so the multi-KB static part is
+        concatenated once per distinct prompt rather than on every call.
+        """
+        key = self._make_prompt_cache_key(
+            natural_query, schema_pool, sorted_paths, top_columns, value_context, conversation_context
+        )
+        cached = self.prompt_cache.get(key)
+        if cached is not None:
+            self.prompt_cache.move_to_end(key)
+            print("🔍 [PROMPT_CACHE] Dynamic prompt retrieved from cache")
+            return cached
+
+        schema_text = format_compact_schema_prompt_with_keywords(
+            schema_pool, paths, fk_graph, top_columns, natural_query,
+            sorted_paths=sorted_paths
+        )
+        dynamic_prompt = generate_strict_prompt_dynamic_only(
+            natural_query, schema_text, schema_pool, value_context,
+            extended_context=conversation_context
+        )
+
+        # Model, STATIC_PROMPT kısmını hafızasından (KV Cache) tanıyacak ve baştan işlemeyecektir.
+        full_prompt = f"{STATIC_PROMPT}\n\n{dynamic_prompt}"
+
+        self.prompt_cache[key] = (dynamic_prompt, full_prompt)
+        if len(self.prompt_cache) > PROMPT_CACHE_SIZE:
+            self.prompt_cache.popitem(last=False)
+        return dynamic_prompt, full_prompt
+
+    def _call_llm_cached(self, full_prompt: str, max_tokens: int, temperature: float,
+                         top_p: float, stop: Tuple[str, ...]) -> str:
+        """
+        Call the LLM and return the parsed text.
+        Greedy (temperature=0) outputs are deterministic, so they are cached by
+        prompt hash + sampling params and identical prompts skip the LLM entirely.
+        """
+        prompt_hash = hashlib.blake2b(full_prompt.encode("utf-8"), digest_size=16).hexdigest()
+        key = (prompt_hash, max_tokens, temperature, top_p, stop)
+        cacheable = temperature == 0
+
+        if cacheable:
+            with self._llm_cache_lock:
+                cached = self.llm_cache.get(key)
+                if cached is not None:
+                    self.llm_cache.move_to_end(key)
+                    print("🔍 [LLM_CACHE] LLM response retrieved from cache")
+                    return cached
+
+        with LLM_LOCK:
+            response = self.llm(
+                full_prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stop=list(stop),  # llama-cpp drops any stop that is not a list or str
+                stream=False
+            )
+        text = self._parse_llm_response(response)
+
+        if cacheable:
+            with self._llm_cache_lock:
+                self.llm_cache[key] = text
+                if len(self.llm_cache) > LLM_CACHE_SIZE:
+                    self.llm_cache.popitem(last=False)
+        return text
+
     def _add_to_conversation_history(self, role: str, content: any, query_type: str = "general"):
         """Append a new message to the conversation history."""
         # Add logic to clean up previous cache
@@ -145,27 +321,41 @@ class InteractiveSQLGenerator:
                         del self.previous_conversation_fk_cache[key]
                     print(f"🔍 [CACHE_CLEANUP] {len(keys_to_remove)} old cache entries cleaned")
         
-        self.conversation_history.append({
+        message = {
             "role": role,
             "content": content,
             "timestamp": time.time(),
             "type": query_type
-        })
+        }
+        self.conversation_history.append(message)
+        if query_type in ("user_query", "successful_sql"):
+            self._history_version += 1
+        if role == "assistant" and query_type == "successful_sql":
+            # Extract tables once here so the next turn's reference lookup needs no regex work
+            message["tables"] = self._extract_tables_from_sql(content)
+            self._successful_sql_msgs.appendleft(message)
         
         # Keep the last 20 messages (for performance)
         if len(self.conversation_history) > 20:
             self.conversation_history = self.conversation_history[-20:]
+            self._history_version += 1
 
     def _get_extended_conversation_context(self) -> str:
         """Get extended conversation context including FK-PK relationships."""
         if not self.conversation_history:
             return ""
         
+        # Retries within a turn only add error/feedback entries, so the same pairs apply
+        cached_version, cached_context = self._extended_context_cache
+        if cached_version == self._history_version:
+            return cached_context
+        
         # Get last 3 user-assistant pairs
         pairs = self._get_previous_pairs_from_history(limit_pairs=3)
         
         # ✅ If no conversation pairs, return empty string (don't add headers)
         if not pairs:
+            self._extended_context_cache = (self._history_version, "")
             return ""
         
         context_parts = []
@@ -189,7 +379,9 @@ class InteractiveSQLGenerator:
         
         context_parts.append("=== YUKARIDAKİ KONUŞMALARI DİKKATE AL ===\n")
         
-        return "\n".join(context_parts)
+        context = "\n".join(context_parts)
+        self._extended_context_cache = (self._history_version, context)
+        return context
 
     def _get_previous_pairs_from_history(self, limit_pairs: int = 3) -> List[Tuple[Dict, Dict]]:
         """Return up to `limit_pairs` most recent user->assistant(successful_sql) pairs."""
@@ -254,8 +446,11 @@ class InteractiveSQLGenerator:
             
             print(f"🔍 [PREVIOUS_FK_CORRECT] Bulunan paths sayısı: {len(paths)}")
             
+            # Filter to maximal chains and sort once, here at the producer
+            sorted_paths = sorted(_filter_maximal_paths(paths).items())
+            
             # Format the relationships
-            fk_context = self._format_previous_conversation_fk_context(paths, tables)
+            fk_context = self._format_previous_conversation_fk_context(sorted_paths, tables)
             
             if not fk_context:
                 print(f"🔍 [PREVIOUS_FK_CORRECT] Önceki konuşma için FK ilişkisi bulunamadı")
@@ -283,13 +478,7 @@ class InteractiveSQLGenerator:
         
         try:
             # Only take table names from the FROM and JOIN clauses
-            from_pattern = r'\bFROM\s+([a-zA-Z_][a-zA-Z0-9_.]*)'
-            join_pattern = r'\bJOIN\s+([a-zA-Z_][a-zA-Z0-9_.]*)'
-            
-            from_matches = re.findall(from_pattern, sql, re.IGNORECASE)
-            join_matches = re.findall(join_pattern, sql, re.IGNORECASE)
-            
-            for table_name in from_matches + join_matches:
+            for table_name in _TABLE_RE.findall(sql):
                 # If not schema-qualified, add the schema
                 table = table_name if '.' in table_name else f"{settings.DB_SCHEMA}.{table_name}"
                 tables.add(table)
@@ -301,17 +490,16 @@ class InteractiveSQLGenerator:
         
         return tables
 
-    def _format_previous_conversation_fk_context(self, paths: Dict[str, List[Dict]], original_tables: Set[str]) -> str:
+    def _format_previous_conversation_fk_context(self, sorted_paths: List[Tuple[str, List[Dict]]],
+                                                 original_tables: Set[str]) -> str:
         """Format FK-PK relationships in the style used by previous-conversation dynamic prompts."""
-        if not paths:
+        if not sorted_paths:
             return ""
         
-        filtered_paths = _filter_maximal_paths(paths)
-        
         relationship_lines = []
         printed_chains = set()
         
-        for path_key, hops in sorted(filtered_paths.items()):
+        for path_key, hops in sorted_paths:
             if not hops:
                 continue
                 
@@ -346,9 +534,7 @@ class InteractiveSQLGenerator:
         enhanced_query = natural_query
         
         # Check for reference words
-        reference_words = ["bu", "şu", "önceki", "yukarıdaki", "aşağıdaki", "bunu", "şunu"]
-        
-        if any(word in natural_query.lower() for word in reference_words):
+        if _REFERENCE_RE.search(natural_query):
             # Get table info from the last successful query
             last_tables = self._get_last_used_tables()
             if last_tables:
@@ -359,73 +545,54 @@ class InteractiveSQLGenerator:
     def _get_last_used_tables(self) -> List[str]:
         """Return tables from the last successful queries"""
         tables = set()
-        for msg in reversed(self.conversation_history):
-            if msg.get("role") == "assistant" and msg.get("type") == "successful_sql":
-                tables.update(self._extract_tables_from_sql(msg['content']))
+        # Walk only the successful SQL messages (newest first), not the whole history
+        for msg in self._successful_sql_msgs:
+            tables.update(msg['tables'])
             if len(tables) >= 3:  # At most 3 tables
                 break
         return list(tables)
 
     def _extract_tables_from_sql(self, sql: str) -> List[str]:
         """Extract table names from SQL"""
-        tables = []
-        # Find table names from FROM and JOIN clauses
-        from_matches = re.findall(r'\bFROM\s+(\w+)', sql, re.IGNORECASE)
-        join_matches = re.findall(r'\bJOIN\s+(\w+)', sql, re.IGNORECASE)
-        tables.extend(from_matches)
-        tables.extend(join_matches)
-        return [t for t in tables if t]
+        # Find table names from FROM and JOIN clauses in a single scan
+        return _TABLE_RE.findall(sql)
 
     def _parse_llm_response(self, response) -> str:
-        """Parse LLM response - EXACT COPY FROM ORIGINAL"""
+        """Parse LLM response (dict, str or attribute-style object) into plain text."""
         text = ""
         try:
-            if hasattr(response, '__dict__'):
-                response_dict = response.__dict__
-                if 'choices' in response_dict and response_dict['choices']:
-                    choice = response_dict['choices'][0]
-                    if hasattr(choice, '__dict__'):
-                        choice_dict = choice.__dict__
-                        if 'text' in choice_dict:
-                            text = choice_dict['text']
-                        elif 'message' in choice_dict and hasattr(choice_dict['message'], '__dict__'):
-                            message_dict = choice_dict['message'].__dict__
-                            if 'content' in message_dict:
-                                text = message_dict['content']
-                    else:
-                        # ✅ FIX: Handle dict choice (from original)
-                        if isinstance(choice, dict):
-                            if 'text' in choice:
-                                text = choice['text']
-                            elif 'message' in choice and isinstance(choice['message'], dict) and 'content' in choice['message']:
-                                text = choice['message']['content']
-            else:
-                if isinstance(response, str):
-                    text = response
-                elif isinstance(response, dict):
-                    for key in ['text', 'content', 'generated_text']:
-                        if key in response:
-                            text = response[key]
-                            break
-                    # ✅ FIX: Added from original - handle dict with choices
-                    if not text and 'choices' in response and response['choices']:
-                        choice = response['choices'][0]
-                        if isinstance(choice, dict):
-                            if 'text' in choice:
-                                text = choice['text']
-                            elif 'message' in choice and isinstance(choice['message'], dict) and 'content' in choice['message']:
-                                text = choice['message']['content']
+            extractor = _RESPONSE_EXTRACTORS.get(type(response))
+            if extractor is None:
+                # First time we see this type: resolve once, then dispatch in O(1)
+                if isinstance(response, dict):
+                    extractor = _text_from_dict_response
+                elif isinstance(response, str):
+                    extractor = _text_from_str_response
+                else:
+                    extractor = _text_from_object_response
+                _RESPONSE_EXTRACTORS[type(response)] = extractor
+            text = extractor(response)
         except Exception as parse_error:
             print(f"⚠️ Response parsing failed: {parse_error}")
             text = str(response)
         
         return text.strip() if text else "SELECT 1"
 
+    @contextlib.contextmanager
+    def _stage(self, name: str):
+        """Time a pipeline stage with perf_counter; a no-op unless debug is enabled."""
+        if not self.debug:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            print(f"⏱️ {name}: {time.perf_counter() - t0:.3f}s")
+
     def _generate_smart_sql_direct(self, natural_query: str, error_context: str = "", 
-                        hybrid_results: Optional[Dict] = None) -> str:
+                        hybrid_results: Optional[Dict] = None, attempt: int = 1) -> str:
         """Generate SQL directly using conversation history and cached static prompt."""
-        start_time = time.time()
-
         # 1. Gerekli verilerin toplanması (Hız için özet geçilmiştir)
         fk_graph = load_fk_graph()
         if hybrid_results is None:
@@ -444,188 +611,68 @@ class InteractiveSQLGenerator:
         schema_pool, paths, value_context = build_compact_schema_pool(
             semantic_results, selected_tables, fk_graph, top_columns=top_columns
         )
+        # Filter to maximal chains and sort once; both formatters reuse this list
+        sorted_paths = sorted(_filter_maximal_paths(paths).items())
         
-        self._cache_current_fk_paths(natural_query, paths)
+        self._cache_current_fk_paths(natural_query, sorted_paths)
         conversation_context = self._get_extended_conversation_context()
         
-        schema_text = format_compact_schema_prompt_with_keywords(
-            schema_pool, paths, fk_graph, top_columns, natural_query
-        )
-        
-        # 2. Dinamik promptun oluşturulması
-        dynamic_prompt = generate_strict_prompt_dynamic_only(
-            natural_query, schema_text, schema_pool, value_context,
-            extended_context=conversation_context
-        )
+        # 2. Şema metni ve dinamik promptun oluşturulması (aynı girdiler için cache'ten)
+        with self._stage("Prompt generation"):
+            dynamic_prompt, full_prompt = self._build_prompt_cached(
+                natural_query, schema_pool, paths, sorted_paths, fk_graph,
+                top_columns, value_context, conversation_context
+            )
+
+        if self.debug:
+            print(f"\n{'='*100}")
+            print(f"🎯 DİNAMİK PROMPT İÇERİĞİ:")
+            print(f"{'='*100}")
+            print(dynamic_prompt)
+            print(f"{'='*100}")
+            print(f"🎯 DİNAMİK PROMPT UZUNLUĞU: {len(dynamic_prompt)} karakter")
+            print(f"{'='*100}\n")
 
         # 3. LLM ÇAĞRISI (Statik + Dinamik)
-        # Model, STATIC_PROMPT kısmını hafızasından (KV Cache) tanıyacak ve baştan işlemeyecektir.
-        full_prompt = f"{STATIC_PROMPT}\n\n{dynamic_prompt}"
+        temperature, top_p = DECODING_VARIANTS[min(attempt, len(DECODING_VARIANTS)) - 1]
         
-        llm_start = time.time()
         try:
-            response = self.llm(
-                full_prompt,
-                max_tokens=500,
-                temperature=0,
-                top_p=0.9,
-                stop=[";", "Kullanıcı", "Açıklama", "```\n\n"],
-                stream=False
-            )
-            text = self._parse_llm_response(response)
-            print(f"⏱️ LLM call (Cached): {time.time() - llm_start:.2f}s")
-            
+            with self._stage("LLM call (Cached)"):
+                text = self._call_llm_cached(
+                    full_prompt,
+                    max_tokens=SQL_MAX_TOKENS,
+                    temperature=temperature,
+                    top_p=top_p,
+                    stop=_LLM_STOP
+                )
         except Exception as e:
             print(f"❌ LLM call failed: {e}")
             text = "SELECT 1"
 
         # 4. SQL Temizleme ve Auto-fix (Mevcut kodun devamı)
-        sql_text = extract_sql_from_response(text)
-        sql_text, _ = clean_meaningless_where_clauses(sql_text)
-        fixed_sql, _, _ = auto_fix_sql_identifiers(sql_text, schema_pool, value_context)
+        with self._stage("SQL cleanup + auto-fix"):
+            sql_text = extract_sql_from_response(text)
+            sql_text, _ = clean_meaningless_where_clauses(sql_text)
+            fixed_sql, _, _ = auto_fix_sql_identifiers(sql_text, schema_pool, value_context)
         
         return fixed_sql
 
-        # 5. Build compact schema pool
-        schema_start = time.time()
-        schema_pool, paths, value_context = build_compact_schema_pool(
-            semantic_results, selected_tables, fk_graph, top_columns=top_columns
-        )
-        
-        # Cache this query's FK paths
-        self._cache_current_fk_paths(natural_query, paths)
-        
-        # 6. Get conversation history and FK relationships
-        conversation_context = self._get_extended_conversation_context()
-        
-        # 7. Schema formatting
-        prompt_start = time.time()
-        schema_text = format_compact_schema_prompt_with_keywords(
-            schema_pool, paths, fk_graph, top_columns, natural_query
-        )
-        
-        # 8. Build dynamic prompt - MATCHING ORIGINAL EXACTLY
-        # extended_context is passed separately to the function now
-        dynamic_prompt = generate_strict_prompt_dynamic_only(
-            natural_query, schema_text, schema_pool, value_context,
-            extended_context=conversation_context  # ✅ Pass as separate parameter like original
-        )
-
-        print(f"⏱️  [3] Prompt generation: {time.time() - prompt_start:.2f}s")
-        print(f"📝 Context uzunluğu: Konuşma: {len(conversation_context)}")
-        
-        # Print dynamic prompt content
-        print(f"\n{'='*100}")
-        print(f"🎯 DİNAMİK PROMPT İÇERİĞİ:")
-        print(f"{'='*100}")
-        print(dynamic_prompt)
-        print(f"{'='*100}")
-        print(f"🎯 DİNAMİK PROMPT UZUNLUĞU: {len(dynamic_prompt)} karakter")
-        print(f"🎯 STATIC_PROMPT UZUNLUĞU: {len(STATIC_PROMPT)} karakter")
-        print(f"{'='*100}\n")
-
-        # 9. LLM call
-        llm_start = time.time()
-        try:
-            # CRITICAL: Combine STATIC_PROMPT + dynamic_prompt
-            # KV cache doesn't work automatically - must send full prompt each time!
-            full_prompt = STATIC_PROMPT + "\n\n" + dynamic_prompt
-            
-            print(f"🎯 FULL PROMPT UZUNLUĞU: {len(full_prompt)} karakter (STATIC + dynamic)")
-            print(f"{'='*100}\n")
-            
-            response = self.llm(
-                full_prompt,
-                max_tokens=500,
-                temperature=0,
-                top_p=0.9,
-                stop=[";", "Kullanıcı", "Açıklama", "AÇIKLAMA", "**AÇIKLAMA**", "ÖRNEK", "```\n\n", "<|end"],
-                stream=False,
-                echo=False
-            )
-            
-            # Response parsing
-            text = self._parse_llm_response(response)
-            
-            print(f"⏱️  [4] LLM call: {time.time() - llm_start:.2f}s")
-            print(f"🤖 LLM Response:\n{text}\n")
-            
-        except Exception as e:
-            print(f"❌ LLM call failed: {e}")
-            text = "SELECT 1"
-
-        # 10. Extract SQL
-        extraction_start = time.time()
-        sql_text = extract_sql_from_response(text)
-        print(f"⏱️  [5] SQL extraction: {time.time() - extraction_start:.2f}s")
-        
-        # 11. Clean meaningless WHERE clauses
-        sql_text, where_changes = clean_meaningless_where_clauses(sql_text)
-        if where_changes:
-            print(f"🧹 Cleaned WHERE clauses:")
-            for c in where_changes:
-                print(f"  - {c}")
-        
-        # 12. Auto-fix
-        autofix_start = time.time()
-        try:
-            print("🔧 Auto-fix running...")
-            fixed_sql, changes, issues = auto_fix_sql_identifiers(
-                sql_text, schema_pool, value_context
-            )
-            if changes:
-                print(f"🔁 Auto-fix applied. Changes ({len(changes)}):")
-                for c in changes[:5]:
-                    print("  -", c)
-                sql_to_format = fixed_sql
-            else:
-                print("🔎 Auto-fix found no changes.")
-                sql_to_format = sql_text
-            
-            if issues:
-                print("⚠️ Auto-fix issues:")
-                for it in issues[:3]:
-                    print("  -", it)
-                    
-        except Exception as e:
-            print(f"❌ Auto-fix failed: {e}")
-            sql_to_format = sql_text
-        
-        print(f"⏱️  [6] Auto-fix: {time.time() - autofix_start:.2f}s")
-        
-        # 13. Format SQL
-        format_start = time.time()
-        try:
-            parsed = sqlparse.parse(sql_to_format)
-            if not parsed:
-                raise ValueError("❌ SQL parse edilemedi")
-            final_sql = sqlparse.format(str(parsed[0]), reindent=True, keyword_case='upper')
-        except Exception as e:
-            print(f"❌ SQL formatting failed: {e}")
-            final_sql = sql_to_format
-        
-        print(f"⏱️  [7] SQL formatting: {time.time() - format_start:.2f}s")
-        
-        total_time = time.time() - start_time
-        print(f"\n{'#'*80}")
-        print(f"# ✅ COMPLETED - {total_time:.2f}s")
-        print(f"# FINAL SQL:")
-        print(f"{'#'*80}")
-        print(final_sql)
-        print(f"{'#'*80}\n")
-        
-        return final_sql
-
-    def _get_current_schema_pool(self, natural_query: str = "schema discovery") -> Dict:
-        """Get current schema pool."""
+    def _get_current_schema_pool(self, natural_query: str = "schema discovery",
+                                 hybrid_results: Optional[Dict] = None) -> Dict:
+        """
+        Get current schema pool (memoized per query).
+        Reuses `hybrid_results` from the caller when given instead of searching again.
+        """
         try:
-            # If schema pool doesn't exist, construct via hybrid search
-            if not self.current_schema_pool:
+            query_key = hash(natural_query)
+            # If schema pool doesn't exist for this query, construct via hybrid search
+            if not self.current_schema_pool or self._schema_pool_query_key != query_key:
                 print("🔍 Schema pool bulunamadı, yeniden oluşturuluyor...")
                 fk_graph = load_fk_graph()
                 
-                # Do hybrid search
-                hybrid_results = hybrid_search_with_separate_results(natural_query, top_k=MAX_INITIAL_RESULTS)
+                # Do hybrid search (only if the caller has not already done it)
+                if hybrid_results is None:
+                    hybrid_results = hybrid_search_with_separate_results(natural_query, top_k=MAX_INITIAL_RESULTS)
                 
                 # Prepare semantic results in correct format
                 semantic_results = {
@@ -648,6 +695,7 @@ class InteractiveSQLGenerator:
                 )
                 
                 self.current_schema_pool = schema_pool
+                self._schema_pool_query_key = query_key
 
                 print(f"✅ Schema pool created: {len(schema_pool)} tables")
             
@@ -657,17 +705,38 @@ class InteractiveSQLGenerator:
             print(f"❌ Schema pool creation error: {e}")
             return {}
 
+    def _build_result(self, *, success: bool, sql: str, error: Optional[str], attempts: int,
+                      needs_clarification: bool = False, **extra) -> Dict:
+        """Build the result dict returned to the API (common keys + any extra fields)."""
+        result = {
+            "success": success,
+            "sql": sql,
+            "error": error,
+            "needs_clarification": needs_clarification,
+            "attempts": attempts
+        }
+        result.update(extra)
+        return result
+
     def _handle_error_interactively(self, error_message: str, sql_query: str, 
-                              natural_query: str, attempt: int) -> Optional[Dict]:
+                              natural_query: str, attempt: int,
+                              hybrid_results: Optional[Dict] = None) -> Optional[Dict]:
         """Ask the user about the error interactively."""
         try:
-            # Get current schema pool
-            schema_pool = self._get_current_schema_pool()
-            
-            # Analyze the error
-            error_analysis = self.error_analyzer.analyze_error(
-                error_message, sql_query, schema_pool
-            )
+            # Get current schema pool (reusing this attempt's hybrid search results)
+            schema_pool = self._get_current_schema_pool(natural_query, hybrid_results)
+            
+            # Analyze the error (an identical error on identical SQL reuses this turn's analysis)
+            # (entries keep the pool they were analyzed against; a rebuilt pool misses)
+            key = (error_message, sql_query)
+            cached = self._error_analysis_cache.get(key)
+            if cached is not None and cached[0] is schema_pool:
+                error_analysis = cached[1]
+            else:
+                error_analysis = self.error_analyzer.analyze_error(
+                    error_message, sql_query, schema_pool
+                )
+                self._error_analysis_cache[key] = (schema_pool, error_analysis)
             
             # Add the error to conversation history
             self._add_to_conversation_history("error", error_analysis)
@@ -677,16 +746,16 @@ class InteractiveSQLGenerator:
             # Does user interaction required?
             if error_analysis["needs_clarification"] and attempt < self.max_retries:
                 question = self._format_clarification_question(error_analysis)
-                return {
-                    "success": False,
-                    "sql": sql_query,
-                    "error": error_analysis["message"],
-                    "needs_clarification": True,
-                    "clarification_question": question,
-                    "natural_query": natural_query,
-                    "error_type": error_analysis["error_type"],
-                    "attempts": attempt
-                }
+                return self._build_result(
+                    success=False,
+                    sql=sql_query,
+                    error=error_analysis["message"],
+                    attempts=attempt,
+                    needs_clarification=True,
+                    clarification_question=question,
+                    natural_query=natural_query,
+                    error_type=error_analysis["error_type"]
+                )
                 
         except Exception as e:
             print(f"⚠️ Hata işleme sırasında exception: {e}")
@@ -701,41 +770,38 @@ class InteractiveSQLGenerator:
             invalid_value = error_analysis["problematic_parts"][0] if error_analysis["problematic_parts"] else "bilinmeyen"
             suggestions = error_analysis["suggestions"]
             
-            question = f"⚠️  '{invalid_value}' geçersiz tarih/zaman formatı.\n\n"
-            question += "Lütfen bir seçenek belirleyin:\n"
+            lines = [f"⚠️  '{invalid_value}' geçersiz tarih/zaman formatı.\n", "Lütfen bir seçenek belirleyin:"]
             
             for i, suggestion in enumerate(suggestions, 1):
                 display_text = suggestion.get('description', str(suggestion)) if isinstance(suggestion, dict) else str(suggestion)
-                question += f"{i}. {display_text}\n"
+                lines.append(f"{i}. {display_text}")
             
-            question += "\nLütfen bir numara seçin veya kendi tarih değerinizi yazın:"
-            return question
+            lines.append("\nLütfen bir numara seçin veya kendi tarih değerinizi yazın:")
+            return "\n".join(lines)
             
         elif error_analysis["error_type"] == "missing_table":
             table_name = error_analysis["problematic_parts"][0] if error_analysis["problematic_parts"] else "bilinmeyen"
             suggestions = error_analysis["suggestions"][:3]
             
-            question = f"⚠️  '{table_name}' tablosu bulunamadı.\n\n"
-            question += "Şunlardan birini mi kastettiniz?\n"
+            lines = [f"⚠️  '{table_name}' tablosu bulunamadı.\n", "Şunlardan birini mi kastettiniz?"]
             
             for i, suggestion in enumerate(suggestions, 1):
                 if isinstance(suggestion, dict):
                     table_name_display = suggestion.get('suggested', '')
                     confidence = suggestion.get('confidence', 0)
                     simple_name = unqualify_table(table_name_display)
-                    question += f"{i}. {simple_name} ({confidence}% eşleşme)\n"
+                    lines.append(f"{i}. {simple_name} ({confidence}% eşleşme)")
                 else:
-                    question += f"{i}. {suggestion}\n"
+                    lines.append(f"{i}. {suggestion}")
             
-            question += "\nLütfen bir numara seçin veya doğru tablo adını yazın:"
-            return question
+            lines.append("\nLütfen bir numara seçin veya doğru tablo adını yazın:")
+            return "\n".join(lines)
         
         elif error_analysis["error_type"] == "missing_column":
             column_name = error_analysis["problematic_parts"][0] if error_analysis["problematic_parts"] else "bilinmeyen"
             suggestions = error_analysis["suggestions"][:3]
             
-            question = f"⚠️  '{column_name}' sütunu bulunamadı.\n\n"
-            question += "Şunlardan birini mi kastettiniz?\n"
+            lines = [f"⚠️  '{column_name}' sütunu bulunamadı.\n", "Şunlardan birini mi kastettiniz?"]
             
             for i, suggestion in enumerate(suggestions, 1):
                 if isinstance(suggestion, dict):
@@ -743,22 +809,70 @@ class InteractiveSQLGenerator:
                     table_name = suggestion.get('table', '')
                     confidence = suggestion.get('confidence', 0)
                     table_simple = unqualify_table(table_name)
-                    question += f"{i}. {column_suggested} ({confidence}% eşleşme, tablo: {table_simple})\n"
+                    lines.append(f"{i}. {column_suggested} ({confidence}% eşleşme, tablo: {table_simple})")
                 else:
-                    question += f"{i}. {suggestion}\n"
+                    lines.append(f"{i}. {suggestion}")
             
-            question += "\nLütfen bir numara seçin veya doğru sütun adını yazın:"
-            return question
+            lines.append("\nLütfen bir numara seçin veya doğru sütun adını yazın:")
+            return "\n".join(lines)
             
         else:
             question = f"⚠️  SQL hatası: {error_analysis['message']}\n\nBu hatayı nasıl düzeltmek istersiniz?"
             return question
 
+    def _semantic_context_key(self) -> int:
+        """Hash of the conversation context that prompts are built with (0 for a fresh session)."""
+        context = self._get_extended_conversation_context()
+        if not context:
+            return 0
+        return int.from_bytes(hashlib.blake2b(context.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+    def _answer_from_semantic_cache(self, semantic_cache, question_embedding, context_key: int,
+                                    natural_query: str) -> Optional[Dict]:
+        """Run the cached SQL of a paraphrased question; None on a miss or if the SQL no longer runs."""
+        hit = semantic_cache.lookup(question_embedding, context_key, natural_query)
+        if hit is None:
+            return None
+        cached_question, cached_sql, similarity = hit
+        print(f"🔍 [SEMANTIC_CACHE] Hit (%{int(similarity * 100)}): '{cached_question}'")
+        try:
+            # Only the SQL is cached; rows are always fetched fresh
+            columns, rows, truncated = run_sql(cached_sql)
+        except Exception as e:
+            print(f"⚠️ [SEMANTIC_CACHE] Cached SQL failed, regenerating: {e}")
+            semantic_cache.discard(question_embedding, context_key, natural_query)
+            return None
+        
+        self._add_to_conversation_history("assistant", cached_sql, "successful_sql")
+        self.last_successful_query = {
+            "sql": cached_sql,
+            "natural_query": natural_query,
+            "timestamp": time.time()
+        }
+        return {
+            "success": True,
+            "sql": cached_sql,
+            "columns": columns,
+            "rows": rows,
+            "truncated": truncated,
+            "needs_clarification": False,
+            "attempts": 1
+        }
+
     def generate_with_feedback(self, natural_query: str, user_feedback: Optional[Dict] = None) -> Dict:
         """Generate interactive SQL."""
         attempts = 0
         last_error = None
         current_sql = ""
+        hybrid_results = None
+        self._error_analysis_cache.clear()  # analyses are only reused within one turn
+        
+        # Paraphrase cache (shared across sessions); feedback turns always go to the LLM
+        semantic_cache = None if user_feedback else get_semantic_cache()
+        if semantic_cache is not None:
+            # Keyed before this turn's query enters the history: that is the context the prompt sees
+            context_key = self._semantic_context_key()
+            question_embedding = get_semantic_model().encode([natural_query])[0]
         
         # Add user feedback to conversation history
         if user_feedback:
@@ -778,14 +892,23 @@ class InteractiveSQLGenerator:
         # Add the enriched query to conversation history
         self._add_to_conversation_history("user", enhanced_query, "user_query")
         
+        if semantic_cache is not None:
+            cached_result = self._answer_from_semantic_cache(
+                semantic_cache, question_embedding, context_key, natural_query
+            )
+            if cached_result is not None:
+                return cached_result
+        
         while attempts < self.max_retries:
             attempts += 1
             print(f"\n🔄 SQL Generation Attempt {attempts}/{self.max_retries}")
             
             try:
                 # Perform hybrid search and similarity check
-                print("🔍 Hybrid search yapılıyor...")
-                hybrid_results = hybrid_search_with_separate_results(natural_query, top_k=MAX_INITIAL_RESULTS)
+                # (once per turn: the query is unchanged, so retries reuse the first attempt's results)
+                if hybrid_results is None:
+                    print("🔍 Hybrid search yapılıyor...")
+                    hybrid_results = hybrid_search_with_separate_results(natural_query, top_k=MAX_INITIAL_RESULTS)
                 
                 # Similarity check
                 above_threshold_count = hybrid_results.get("above_threshold_count", 0)
@@ -808,7 +931,8 @@ class InteractiveSQLGenerator:
                             "type": "interactive_table"
                         })
                     
-                    max_similarity = max([score for table, score in similar_tables]) if similar_tables else 0
+                    # similar_tables comes back sorted by score (descending); the first is the best match
+                    max_similarity = similar_tables[0][1]
                     
                     return {
                         "success": False,
@@ -822,11 +946,13 @@ class InteractiveSQLGenerator:
                     }
                 
                 # Generate SQL (no error context on first attempt)
-                current_sql = self._generate_smart_sql_direct(enhanced_query, error_context="", hybrid_results=hybrid_results)
+                current_sql = self._generate_smart_sql_direct(
+                    enhanced_query, error_context="", hybrid_results=hybrid_results, attempt=attempts
+                )
                 
                 # Try running the SQL
                 print("🔍 Running SQL...")
-                columns, rows = run_sql(current_sql)
+                columns, rows, truncated = run_sql(current_sql)
                 
                 # Remember successful queries
                 self._add_to_conversation_history("assistant", current_sql, "successful_sql")
@@ -835,6 +961,8 @@ class InteractiveSQLGenerator:
                     "natural_query": natural_query,
                     "timestamp": time.time()
                 }
+                if semantic_cache is not None:
+                    semantic_cache.insert(question_embedding, context_key, natural_query, current_sql)
                 
                 # Successful
                 return {
@@ -842,6 +970,7 @@ class InteractiveSQLGenerator:
                     "sql": current_sql,
                     "columns": columns,
                     "rows": rows,
+                    "truncated": truncated,
                     "needs_clarification": False,
                     "attempts": attempts
                 }
@@ -852,25 +981,17 @@ class InteractiveSQLGenerator:
                 
                 # Handle the error interactively
                 interactive_result = self._handle_error_interactively(
-                    last_error, current_sql, natural_query, attempts
+                    last_error, current_sql, natural_query, attempts, hybrid_results
                 )
                 
                 if interactive_result:
                     return interactive_result
                 
                 if attempts == self.max_retries:
-                    return {
-                        "success": False,
-                        "sql": current_sql,
-                        "error": last_error,
-                        "needs_clarification": False,
-                        "attempts": attempts
-                    }
+                    return self._build_result(
+                        success=False, sql=current_sql, error=last_error, attempts=attempts
+                    )
         
-        return {
-            "success": False,
-            "sql": current_sql,
-            "error": last_error or "Max retries exceeded",
-            "needs_clarification": False,
-            "attempts": attempts
-        }
+        return self._build_result(
+            success=False, sql=current_sql, error=last_error or "Max retries exceeded", attempts=attempts
+        )
@@ -44,4 +44,4 @@ if [ ! -f "/app/${LLM_PATH}" ] && [ ! -f "/app/models/$(basename ${LLM_PATH})" ]
 fi
 
 echo "Starting uvicorn (host 0.0.0.0:8000)..."
-exec python -m uvicorn Text2SQL_Agent:app --host 0.0.0.0 --port 8000 --reload
+exec python -m uvicorn Text2SQL_Agent:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --reload
@@ -289,7 +289,8 @@ def format_compact_schema_prompt_with_keywords(
     paths: Dict,
     fk_graph: Dict,
     top_columns: List,
-    natural_query: str
+    natural_query: str,
+    sorted_paths: Optional[List[Tuple[str, List[Dict]]]] = None
 ) -> str:
     """
     UPDATED: Include Turkish descriptions from schema keywords to help LLM understand semantic meaning.
@@ -300,6 +301,8 @@ def format_compact_schema_prompt_with_keywords(
         fk_graph: FK graph dictionary
         top_columns: Top columns list
         natural_query: Natural language query
+        sorted_paths: Optional pre-filtered (maximal) and key-sorted path items;
+                      computed from `paths` when not provided
         
     Returns:
         str: Formatted schema prompt
@@ -383,16 +386,17 @@ def format_compact_schema_prompt_with_keywords(
     prompt_parts.append("(Her JOIN yolunda veri tipleri ve hazır SQL örneği verilmiştir - EĞER JOIN KULLANILACAKSA aynen kopyala!)")
     prompt_parts.append("")
     
+    if sorted_paths is None:
+        sorted_paths = sorted(_filter_maximal_paths(paths).items()) if paths else []
+    
     if paths:
-        filtered_paths = _filter_maximal_paths(paths)
-        
         # Debug: Show schema_pool tables
         print(f"🔍 [FK_PATH_FILTER] Schema pool tables: {list(schema_pool.keys())}")
         
         printed_chains = set()
         skipped_paths = 0
         
-        for path_key, hops in sorted(filtered_paths.items()):
+        for path_key, hops in sorted_paths:
             if not hops:
                 continue
             
@@ -489,7 +493,7 @@ def format_compact_schema_prompt_with_keywords(
         print(f"🔍 [FK_PATH_FILTER] Included {len(printed_chains)} paths")
     
     # If no paths found, show all FK relationships from schema_pool with types
-    if not paths or not any(filtered_paths.values() if paths else []):
+    if not paths or not any(hops for _, hops in sorted_paths):
         prompt_parts.append("• (FK ilişkileri yukarıda her sütunun yanında gösterilmiştir)")
         prompt_parts.append("")
         
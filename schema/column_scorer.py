@@ -2,8 +2,12 @@
 Column Scorer - Score and rank columns by relevance
 """
 
+import heapq
 from typing import List, Dict
 
+# Log icon per result source; anything else (data values) falls back to "📊"
+_SOURCE_ICONS = {"semantic": "🧠", "lexical": "🔤", "keyword": "🔑"}
+
 
 def score_columns_by_relevance_separate(semantic_results: dict, value_context: dict, top_n: int = 10) -> list:
     """
@@ -116,12 +120,12 @@ def score_columns_by_relevance_separate(semantic_results: dict, value_context: d
     
     print(f"📊 [COLUMN_SCORING] Unique columns: {len(unique_columns)}")
     
-    # Sort by priority and score
-    final_columns = sorted(
-        unique_columns.values(), 
-        key=lambda x: (x["source_priority"], x["similarity"]), 
-        reverse=True
-    )[:top_n]
+    # Take the top_n by priority and score (bounded heap, no full sort)
+    final_columns = heapq.nlargest(
+        top_n,
+        unique_columns.values(),
+        key=lambda x: (x["source_priority"], x["similarity"])
+    )
     
     # Return as list of dicts for builder compatibility
     formatted_columns = []
@@ -137,7 +141,7 @@ def score_columns_by_relevance_separate(semantic_results: dict, value_context: d
     
     print(f"\n📊 FINAL TOP COLUMNS (SEPARATE GROUPS): {len(formatted_columns)} columns")
     for i, col in enumerate(formatted_columns, 1):
-        icon = "🧠" if col["type"] == "semantic" else "🔤" if col["type"] == "lexical" else "🔑" if col["type"] == "keyword" else "📊"
+        icon = _SOURCE_ICONS.get(col["type"], "📊")
         extra_info = ""
         if col.get("keyword"):
             extra_info = f" [keyword: '{col['keyword']}']"
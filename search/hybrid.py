@@ -2,6 +2,7 @@
 Hybrid Search - Combines multiple search strategies
 """
 
+import heapq
 from typing import List, Dict, Set, Tuple
 from config import settings
 from .semantic import semantic_search
@@ -10,6 +11,18 @@ from .keyword import keyword_search
 from .data_values import data_values_search
 
 
+def _top_above_threshold(results: List[Dict], threshold: float, k: int = 3) -> List[Dict]:
+    """
+    Single pass over `results`: drop items below `threshold` and keep the k best
+    in a bounded heap. Same output (and tie order) as sorting the filtered list and slicing.
+    """
+    return heapq.nlargest(
+        k,
+        (r for r in results if r.get("similarity", 0) >= threshold),
+        key=lambda x: x.get("similarity", 0)
+    )
+
+
 def get_top_tables_from_search_results(search_results: List[Dict], search_type: str, top_k: int = 3) -> List[Tuple[str, float]]:
     """
     Extract the top-scoring tables from search results.
@@ -35,8 +48,8 @@ def get_top_tables_from_search_results(search_results: List[Dict], search_type:
         if table not in table_scores or similarity > table_scores[table]:
             table_scores[table] = similarity
     
-    # Sort by score and take the top_k tables
-    sorted_tables = sorted(table_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    # Take the top_k tables by score (bounded heap, no full sort)
+    sorted_tables = heapq.nlargest(top_k, table_scores.items(), key=lambda x: x[1])
     
     print(f"🏆 [TOP_TABLES_{search_type.upper()}] Top {len(sorted_tables)} tables:")
     for i, (table, score) in enumerate(sorted_tables, 1):
@@ -187,16 +200,16 @@ def hybrid_search_with_separate_results(natural_query: str, top_k: int = 15, sim
             if table not in all_table_scores or similarity > all_table_scores[table]:
                 all_table_scores[table] = similarity
     
-    # Sort the most similar tables (for interactive table)
-    similar_tables = sorted(all_table_scores.items(), key=lambda x: x[1], reverse=True)
+    # Top 6 most similar tables (for interactive table); nlargest is stable, so ties keep
+    # insertion order exactly like sorted(..., reverse=True)[:6]
+    top_similar_tables = heapq.nlargest(6, all_table_scores.items(), key=lambda x: x[1])
     
-    # Filter tables above threshold (informational only)
-    above_threshold_tables = [(table, score) for table, score in similar_tables if score >= similarity_threshold]
+    # Count tables above threshold (informational only)
+    above_threshold_count = sum(1 for score in all_table_scores.values() if score >= similarity_threshold)
     
-    print(f"🏆 [INTERACTIVE_TABLES] Tüm tablolar: {len(similar_tables)}, Eşik üstü: {len(above_threshold_tables)} (threshold: {similarity_threshold})")
+    print(f"🏆 [INTERACTIVE_TABLES] Tüm tablolar: {len(all_table_scores)}, Eşik üstü: {above_threshold_count} (threshold: {similarity_threshold})")
     
     # Show top 6 tables (regardless of threshold)
-    top_similar_tables = similar_tables[:6]
     for i, (table, score) in enumerate(top_similar_tables, 1):
         status = "✓" if score >= similarity_threshold else "⚠"
         print(f"   {i}. {table} (score: {score:.3f}) {status}")
@@ -204,23 +217,19 @@ def hybrid_search_with_separate_results(natural_query: str, top_k: int = 15, sim
     # 3. Select a fixed number of results from each group
     # Semantic: top 3 above threshold
     semantic_threshold = settings.SEMANTIC_THRESHOLD
-    filtered_semantic = [r for r in semantic_results if r.get("similarity", 0) >= semantic_threshold]
-    top_semantic = sorted(filtered_semantic, key=lambda x: x.get("similarity", 0), reverse=True)[:3]
+    top_semantic = _top_above_threshold(semantic_results, semantic_threshold)
     
     # Lexical: top 3 above threshold
     lexical_threshold = settings.LEXICAL_THRESHOLD
-    filtered_lexical = [r for r in lexical_results if r.get("similarity", 0) >= lexical_threshold]
-    top_lexical = sorted(filtered_lexical, key=lambda x: x.get("similarity", 0), reverse=True)[:3]
+    top_lexical = _top_above_threshold(lexical_results, lexical_threshold)
     
     # Keyword: top 3 above threshold
     keyword_threshold = settings.KEYWORD_THRESHOLD
-    filtered_keywords = [r for r in keyword_results if r.get("similarity", 0) >= keyword_threshold]
-    top_keyword = sorted(filtered_keywords, key=lambda x: x.get("similarity", 0), reverse=True)[:3]
+    top_keyword = _top_above_threshold(keyword_results, keyword_threshold)
     
     # Data values: top 3 above threshold
     data_values_threshold = settings.DATA_VALUES_THRESHOLD
-    filtered_data_values = [r for r in data_values_results if r.get("similarity", 0) >= data_values_threshold]
-    top_data_values = sorted(filtered_data_values, key=lambda x: x.get("similarity", 0), reverse=True)[:3]
+    top_data_values = _top_above_threshold(data_values_results, data_values_threshold)
 
     print(f"🔍 [SEPARATE_SEARCH] Top 3 semantic (threshold {semantic_threshold}): {len(top_semantic)}")
     print(f"🔍 [SEPARATE_SEARCH] Top 3 lexical (threshold {lexical_threshold}): {len(top_lexical)}")
@@ -309,5 +318,5 @@ def hybrid_search_with_separate_results(natural_query: str, top_k: int = 15, sim
         "selected_tables": list(set([table for table, score in top_semantic_tables + top_lexical_tables + top_keyword_tables + top_data_values_tables])),
         "similar_tables": top_similar_tables,
         "similarity_threshold": similarity_threshold,
-        "above_threshold_count": len(above_threshold_tables)
+        "above_threshold_count": above_threshold_count
     }
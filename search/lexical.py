@@ -3,6 +3,7 @@ Lexical Search - TF-IDF based character n-gram search
 """
 
 import numpy as np
+from qdrant_client.http import models
 from config import settings
 from utils.qdrant import get_qdrant_client, normalize_qdrant_hit
 
@@ -25,7 +26,7 @@ def lexical_search(query: str, top_k: int = 10):
         try:
             import joblib
             tfidf_vectorizer = joblib.load(settings.TFIDF_VECTORIZER_PATH)
-            print(f"✅ TF-IDF vectorizer loaded. Feature count: {len(tfidf_vectorizer.get_feature_names_out())}")
+            print("✅ TF-IDF vectorizer loaded")
         except Exception as e:
             print(f"❌ TF-IDF vectorizer failed to load: {e}")
             return []
@@ -37,22 +38,28 @@ def lexical_search(query: str, top_k: int = 10):
         q_clean = query.replace('_', ' ').lower()
         print(f"🔍 [LEXICAL] Cleaned query: {q_clean}")
 
-        # Build TF-IDF vector
-        query_vec = tfidf_vectorizer.transform([q_clean])
-        query_vec_dense = query_vec.toarray().ravel()
-        
-        print(f"🔍 [LEXICAL] Vector dimension: {query_vec_dense.shape[0]}")
-        
+        # Build TF-IDF vector (sparse; only the n-grams present in the query)
+        query_vec = tfidf_vectorizer.transform([q_clean]).tocsr()
+        query_vec.sum_duplicates()
+
+        print(f"🔍 [LEXICAL] Non-zero n-grams: {query_vec.nnz}")
+        if query_vec.nnz == 0:
+            return []  # no known n-gram: every score would be 0
+
         # Normalize
-        norm = np.linalg.norm(query_vec_dense)
+        norm = np.linalg.norm(query_vec.data)
         if norm > 0:
-            query_vec_dense = query_vec_dense / norm
+            query_vec.data = query_vec.data / norm
 
-        # Search in Qdrant
+        # Search in Qdrant (sparse dot product == cosine on unit-length vectors)
         client = get_qdrant_client()
         results = client.query_points(
             collection_name=settings.QDRANT_LEXICAL_COLLECTION,
-            query=query_vec_dense.astype("float32").tolist(),
+            query=models.SparseVector(
+                indices=query_vec.indices.tolist(),
+                values=query_vec.data.astype("float32").tolist(),
+            ),
+            using=settings.QDRANT_LEXICAL_VECTOR_NAME,
             limit=top_k
         )
 
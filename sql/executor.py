@@ -2,42 +2,128 @@
 SQL Executor - Run SQL queries and format results
 """
 
-from typing import List, Tuple
+import re
+from decimal import Decimal
+from functools import lru_cache
+from html import escape
+from typing import List, Optional, Tuple
+from uuid import uuid4
 
-from utils.db import get_connection
+import psycopg2
 
+from config import settings
+from utils.db import pooled_connection
 
-def run_sql(sql: str) -> Tuple[List[str], List[Tuple]]:
+# Only plain queries can be DECLAREd as a server-side cursor. WITH is included since most
+# CTEs are read-only; one wrapping DELETE/UPDATE/INSERT ... RETURNING is rejected by
+# DECLARE and rerun on a plain cursor (see run_sql)
+_CURSOR_SQL_RE = re.compile(r'^\s*\(*\s*(SELECT|WITH|VALUES)\b', re.IGNORECASE)
+
+# str() of these never contains HTML special characters, so their cells skip escape()
+_NUMERIC_CELL_TYPES = (int, float, Decimal, bool)
+_TYPE_SAMPLE_ROWS = 20  # rows inspected to find each column's value type
+
+
+@lru_cache(maxsize=64)
+def _row_formatter(column_types: Tuple[Optional[type], ...]):
+    """
+    Generate and compile a '<tr>...</tr>' formatter specialized to the column types.
+    
+    The per-cell type dispatch is decided once per result shape instead of once per cell.
+    A numeric column still checks each value's exact type and falls back to escaping,
+    so an unexpected value can never reach the HTML unescaped.
+    """
+    names = [f"v{i}" for i in range(len(column_types))]
+    namespace = {"_e": escape}
+    cells = []
+    for i, (name, col_type) in enumerate(zip(names, column_types)):
+        if col_type in _NUMERIC_CELL_TYPES:
+            namespace[f"_t{i}"] = col_type
+            cell = f"str({name}) if type({name}) is _t{i} else _e(str({name}))"
+        elif col_type is str:
+            cell = f"_e({name}) if type({name}) is str else _e(str({name}))"
+        else:
+            cell = f"_e(str({name}))"
+        cells.append(f"('<td>NULL</td>' if {name} is None else '<td>' + ({cell}) + '</td>')")
+    
+    unpack = f"    {', '.join(names)}, = row\n" if names else ""
+    body = " + ".join(cells) if cells else "''"
+    source = f"def _format_row(row):\n{unpack}    return '<tr>' + {body} + '</tr>'\n"
+    exec(compile(source, "<results_to_html row formatter>", "exec"), namespace)
+    return namespace["_format_row"]
+
+
+def _sample_column_types(rows: List[Tuple], width: int) -> Tuple[Optional[type], ...]:
+    """Type of the first non-NULL value per column in the leading rows (None if all NULL)."""
+    types = [None] * width
+    missing = set(range(width))
+    for row in rows[:_TYPE_SAMPLE_ROWS]:
+        for i in list(missing):
+            if row[i] is not None:
+                types[i] = type(row[i])
+                missing.discard(i)
+        if not missing:
+            break
+    return tuple(types)
+
+
+def run_sql(sql: str, max_rows: Optional[int] = None) -> Tuple[List[str], List[Tuple], bool]:
     """
     Run SQL query and return columns and rows.
     
+    Queries are read through a named (server-side) cursor in batches and cut off
+    after `max_rows`, so a huge result set never gets materialized in the worker.
+    
     Args:
         sql: SQL query to execute
+        max_rows: Row limit (defaults to settings.RESULT_MAX_ROWS)
         
     Returns:
-        tuple: (columns, rows) where columns is list of column names
-               and rows is list of tuples
+        tuple: (columns, rows, truncated) where columns is list of column names,
+               rows is list of tuples and truncated tells whether rows were cut off
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    if max_rows is None:
+        max_rows = settings.RESULT_MAX_ROWS
     
-    try:
-        cursor.execute(sql)
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-        return columns, rows
-    finally:
-        cursor.close()
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = None
+        if _CURSOR_SQL_RE.match(sql):
+            named_cursor = conn.cursor(name=f"t2s_{uuid4().hex}")
+            named_cursor.itersize = settings.RESULT_FETCH_BATCH
+            try:
+                named_cursor.execute(sql)
+                cursor = named_cursor
+            except psycopg2.errors.FeatureNotSupported:
+                # Data-modifying CTE: "DECLARE CURSOR must not contain data-modifying
+                # statements in WITH". Nothing ran; rerun it on a plain cursor.
+                conn.rollback()
+        
+        with cursor or conn.cursor() as cursor:
+            if cursor.name is None:
+                cursor.execute(sql)
+            rows = []
+            batch_size = settings.RESULT_FETCH_BATCH
+            # Read one row past the limit to tell a cut-off result from one that fits exactly
+            while len(rows) <= max_rows:
+                batch = cursor.fetchmany(min(batch_size, max_rows + 1 - len(rows)))
+                if not batch:
+                    break
+                rows.extend(batch)
+            truncated = len(rows) > max_rows
+            del rows[max_rows:]
+            # Named cursors only fill in description after the first fetch
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            return columns, rows, truncated
 
 
-def results_to_html(columns: List[str], rows: List[Tuple]) -> str:
+def results_to_html(columns: List[str], rows: List[Tuple], truncated: bool = False) -> str:
     """
     Sonuçları modern HTML tabloya çevir
     
     Args:
         columns: List of column names
         rows: List of result tuples
+        truncated: Whether run_sql cut the result off at its row limit
         
     Returns:
         str: HTML formatted table
@@ -45,13 +131,22 @@ def results_to_html(columns: List[str], rows: List[Tuple]) -> str:
     if not rows:
         return '<div class="status-message status-info"><i class="fas fa-info-circle"></i> No results found.</div>'
     
-    html = '<div class="table-container">'
-    html += '<div class="sql-header"><strong><i class="fas fa-table"></i> Query Results:</strong>'
-    html += f'<span> ({len(rows)} row{"s" if len(rows) != 1 else ""})</span></div>'
-    html += '<table>'
-    html += '<thead><tr>' + ''.join(f'<th>{c}</th>' for c in columns) + '</tr></thead>'
-    html += '<tbody>'
-    for row in rows:
-        html += '<tr>' + ''.join(f'<td>{str(v) if v is not None else "NULL"}</td>' for v in row) + '</tr>'
-    html += '</tbody></table></div>'
-    return html
+    row_label = f'{len(rows)} row{"s" if len(rows) != 1 else ""}'
+    if truncated:
+        row_label = f'first {len(rows)} rows, limit reached'
+    
+    # Collect fragments and join once (repeated += copies the whole buffer on every row)
+    parts = [
+        '<div class="table-container">',
+        '<div class="sql-header"><strong><i class="fas fa-table"></i> Query Results:</strong>',
+        f'<span> ({row_label})</span></div>',
+        '<table>',
+        '<thead><tr>' + ''.join(f'<th>{escape(str(c))}</th>' for c in columns) + '</tr></thead>',
+        '<tbody>',
+    ]
+    # Cell values come from the database: escape them (html.escape is C-implemented).
+    # Rows are formatted by a function compiled for this result's column types.
+    format_row = _row_formatter(_sample_column_types(rows, len(rows[0])))
+    parts.extend(map(format_row, rows))
+    parts.append('</tbody></table></div>')
+    return ''.join(parts)
@@ -3,13 +3,149 @@ SQL Fixer - Automatic SQL identifier correction and cleaning
 """
 
 import re
+import sys
+import threading
 import sqlparse
-from fuzzywuzzy import fuzz
+from sqlparse.engine import FilterStack
+from collections import OrderedDict
+from functools import lru_cache
+from rapidfuzz import fuzz, process
 from typing import Dict, Optional, Tuple, List
 
 from config import settings
 
 
+# Meaningless WHERE condition followed by ';', end of line or a trailing clause
+_WHERE_NOOP_RE = re.compile(
+    r'\s+WHERE\s+(1\s*=\s*1|TRUE)\s*(?=;|\n|$|\s+GROUP\s+BY|\s+ORDER\s+BY|\s+LIMIT)',
+    re.IGNORECASE
+)
+# Qualified reference 'ref.col' (word characters only), used to narrow the ::TEXT cast targets.
+# Zero-width so 'schema.table.col' yields both 'schema.table' and 'table.col'.
+_QUALIFIED_REF_RE = re.compile(r'(?=\b(\w+)\.(\w+)\b(?!\s*::))')
+
+
+@lru_cache(maxsize=256)
+def _flatten_sql_tokens(sql_text: str) -> Optional[Tuple[Tuple, Tuple[int, ...]]]:
+    """
+    Lex SQL once and return the flattened tokens of its first statement plus
+    each token's start offset in `sql_text` (one extra trailing offset marks the
+    statement end); None if nothing was parsed. Cached: repeated SQL (e.g. from
+    LLM cache hits) skips sqlparse's pure-Python lexer. Read-only for callers.
+    Only the leaf tokens are used, so this runs sqlparse's lexer + statement
+    splitter without the grouping phase (same leaves as sqlparse.parse).
+    """
+    statement = next(iter(FilterStack().run(sql_text)), None)
+    if statement is None:
+        return None
+    tokens = tuple(statement.flatten())
+    # sqlparse is lossless, so token values concatenate back to the source text
+    offsets = [0]
+    for token in tokens:
+        offsets.append(offsets[-1] + len(token.value))
+    return tokens, tuple(offsets)
+
+
+# Lookup tables derived from a schema pool, keyed by (id(pool), schema_prefix).
+# The pool object is stored next to its indices: while an entry exists it keeps its pool
+# (and so its id) alive, and hits are confirmed with `is`, so a recycled id is never a hit.
+# Auto-fix runs on API worker threads, so every get / move_to_end / insert / evict
+# sequence holds _SCHEMA_INDEX_LOCK (the indices themselves are built outside it).
+_SCHEMA_INDEX_CACHE = OrderedDict()
+_SCHEMA_INDEX_LOCK = threading.Lock()
+_SCHEMA_INDEX_CACHE_SIZE = 4
+_FIX_RESULTS_PER_POOL = 32  # Max memoized auto-fix results kept with each schema pool's indices
+
+
+def _strip_prefix(name: str, prefix_lc: str) -> str:
+    """Drop a leading 'schema.' (`prefix_lc`, lowercase with the dot) case-insensitively."""
+    if name and name[:len(prefix_lc)].lower() == prefix_lc:
+        return name[len(prefix_lc):]
+    return name
+
+
+def _schema_indices(schema_pool: Dict, schema_prefix: str) -> Dict:
+    """
+    Build (or reuse) the lookup tables auto-fix needs for a schema pool.
+    Retries on the same query pass the same pool object, so the per-table and
+    per-column scans run once per pool instead of once per auto-fix call.
+    Lowercase identifiers are interned so repeated lookups hit shared strings.
+    """
+    key = (id(schema_pool), schema_prefix)
+    with _SCHEMA_INDEX_LOCK:
+        cached = _SCHEMA_INDEX_CACHE.get(key)
+        if cached is not None and cached[0] is schema_pool:
+            _SCHEMA_INDEX_CACHE.move_to_end(key)
+            return cached[1]
+
+    prefix_lc = f"{schema_prefix.lower()}."
+
+    all_columns_by_table = {}
+    columns_lower_by_table = {}  # {table_name: [col1_lower, ...]} aligned with all_columns_by_table
+    column_lookup_by_table = {}  # {table_name: {col_lower: canonical col}} for exact matches
+    varchar_columns = {}  # {table_name: [col1, col2, ...]}
+    for table_name, table_data in schema_pool.items():
+        if isinstance(table_data, dict):
+            all_columns_by_table[table_name] = table_data.get('columns', [])
+            varchar_cols = []
+            for col_name, col_info in table_data.get('column_details', {}).items():
+                data_type = col_info.get('data_type', '').upper()
+                if 'VARCHAR' in data_type or 'TEXT' in data_type or 'CHARACTER' in data_type:
+                    varchar_cols.append(col_name)
+            if varchar_cols:
+                varchar_columns[table_name] = varchar_cols
+        else:
+            all_columns_by_table[table_name] = table_data
+        columns_lower_by_table[table_name] = [sys.intern(c.lower()) for c in all_columns_by_table[table_name] or []]
+        lookup = {}
+        for col, col_lower in zip(all_columns_by_table[table_name] or [], columns_lower_by_table[table_name]):
+            lookup.setdefault(col_lower, col)
+        column_lookup_by_table[table_name] = lookup
+
+    lower_to_canonical = {}     # lowercase key -> first matching canonical key
+    stripped_to_canonical = {}  # lowercase unprefixed key -> first matching canonical key
+    canonical_keys = []         # canonical keys, aligned with stripped_keys
+    stripped_keys = []          # lowercase unprefixed keys for fuzzy matching
+    for k in schema_pool:
+        stripped_k = sys.intern(_strip_prefix(k, prefix_lc).lower())
+        lower_to_canonical.setdefault(sys.intern(k.lower()), k)
+        stripped_to_canonical.setdefault(stripped_k, k)
+        canonical_keys.append(k)
+        stripped_keys.append(stripped_k)
+
+    # ::TEXT cast targets reachable through bare table names; aliases are added per SQL
+    varchar_cast_targets = {}  # {(ref_lower, col_lower): (table_ref, col_name)}
+    for table_name, cols in varchar_columns.items():
+        stripped_table = _strip_prefix(table_name, prefix_lc)
+        for col_name in cols:
+            varchar_cast_targets.setdefault((stripped_table.lower(), col_name.lower()), (stripped_table, col_name))
+
+    indices = {
+        "prefix_lc": prefix_lc,
+        "all_columns_by_table": all_columns_by_table,
+        "columns_lower_by_table": columns_lower_by_table,
+        "column_lookup_by_table": column_lookup_by_table,
+        "varchar_columns": varchar_columns,
+        "varchar_cast_targets": varchar_cast_targets,
+        "lower_to_canonical": lower_to_canonical,
+        "stripped_to_canonical": stripped_to_canonical,
+        "canonical_keys": canonical_keys,
+        "stripped_keys": stripped_keys,
+        "fix_results": {},  # {sql_text: (fixed_sql, changes, issues)} for this pool
+    }
+    with _SCHEMA_INDEX_LOCK:
+        cached = _SCHEMA_INDEX_CACHE.get(key)
+        if cached is not None and cached[0] is schema_pool:
+            # Another thread built the same pool's indices meanwhile; share that copy
+            _SCHEMA_INDEX_CACHE.move_to_end(key)
+            return cached[1]
+        _SCHEMA_INDEX_CACHE[key] = (schema_pool, indices)
+        _SCHEMA_INDEX_CACHE.move_to_end(key)
+        if len(_SCHEMA_INDEX_CACHE) > _SCHEMA_INDEX_CACHE_SIZE:
+            _SCHEMA_INDEX_CACHE.popitem(last=False)
+    return indices
+
+
 def clean_meaningless_where_clauses(sql_text: str) -> Tuple[str, List[str]]:
     """
     Remove meaningless WHERE clauses like WHERE 1 = 1, WHERE TRUE, etc.
@@ -21,25 +157,16 @@ def clean_meaningless_where_clauses(sql_text: str) -> Tuple[str, List[str]]:
         tuple: (cleaned_sql, list of changes)
     """
     changes = []
-    cleaned_sql = sql_text
-    
-    # Pattern 1: WHERE 1 = 1
-    pattern1 = r'\s+WHERE\s+1\s*=\s*1\s*;'
-    if re.search(pattern1, cleaned_sql, re.IGNORECASE):
-        cleaned_sql = re.sub(pattern1, ';', cleaned_sql, flags=re.IGNORECASE)
-        changes.append("Removed meaningless 'WHERE 1 = 1'")
-    
-    # Pattern 2: WHERE TRUE
-    pattern2 = r'\s+WHERE\s+TRUE\s*;'
-    if re.search(pattern2, cleaned_sql, re.IGNORECASE):
-        cleaned_sql = re.sub(pattern2, ';', cleaned_sql, flags=re.IGNORECASE)
-        changes.append("Removed meaningless 'WHERE TRUE'")
-    
-    # Pattern 3: WHERE 1=1 (multiline - before GROUP BY, ORDER BY, LIMIT, etc.)
-    pattern3 = r'\s+WHERE\s+1\s*=\s*1\s*(?=\n|$|\s+GROUP\s+BY|\s+ORDER\s+BY|\s+LIMIT)'
-    if re.search(pattern3, cleaned_sql, re.IGNORECASE):
-        cleaned_sql = re.sub(pattern3, '', cleaned_sql, flags=re.IGNORECASE)
-        changes.append("Removed meaningless 'WHERE 1 = 1' (before clause)")
+
+    def _drop(match: re.Match) -> str:
+        condition = "TRUE" if match.group(1).upper() == "TRUE" else "1 = 1"
+        message = f"Removed meaningless 'WHERE {condition}'"
+        if message not in changes:
+            changes.append(message)
+        return ""
+
+    # One scan covers WHERE 1 = 1 / WHERE TRUE before ';', end of line or GROUP BY/ORDER BY/LIMIT
+    cleaned_sql = _WHERE_NOOP_RE.sub(_drop, sql_text)
     
     return cleaned_sql, changes
 
@@ -73,50 +200,31 @@ def auto_fix_sql_identifiers(
     issues = []
     fixed_sql = sql_text
     
-    # Tüm sütunları schema_pool'dan topla
-    all_columns_by_table = {}
-    for table_name, table_data in schema_pool.items():
-        if isinstance(table_data, dict):
-            all_columns_by_table[table_name] = table_data.get('columns', [])
-        else:
-            all_columns_by_table[table_name] = table_data
+    # Tüm sütunlar ve tablo anahtarları schema_pool'dan (pool başına bir kez) hazırlanır
+    indices = _schema_indices(schema_pool, schema_prefix)
+    all_columns_by_table = indices["all_columns_by_table"]
+    lower_to_canonical = indices["lower_to_canonical"]
+    stripped_to_canonical = indices["stripped_to_canonical"]
+    prefix_lc = indices["prefix_lc"]
+
+    # Fast path: the same SQL was already fixed against this pool (retries, LLM cache hits)
+    cached_result = indices["fix_results"].get(sql_text)
+    if cached_result is not None:
+        fixed_sql, cached_changes, cached_issues = cached_result
+        return fixed_sql, list(cached_changes), list(cached_issues)
 
     def strip_schema_prefix(name):
         if not name:
             return name
         # Strip the schema prefix, keep the table name
-        pattern = fr'^{re.escape(schema_prefix)}\.'
-        return re.sub(pattern, '', name, flags=re.IGNORECASE)
-
-    def add_schema_prefix(name):
-        if not name:
-            return name
-        if not name.lower().startswith(f"{schema_prefix}.") and name.strip():
-            return f"{schema_prefix}.{name}"
-        return name
-
-    # Prepare schema keys both with and without prefix
-    schema_keys = list(schema_pool.keys())
-    schema_keys_lower = [k.lower() for k in schema_keys]
-    
-    # Prefixed ve unprefixed candidate'lar
-    candidates = []
-    for k in schema_keys:
-        candidates.append(k)
-        unprefixed = strip_schema_prefix(k)
-        if unprefixed != k:
-            candidates.append(unprefixed)
+        return _strip_prefix(name, prefix_lc)
 
     def get_canonical_by_stripped(name):
         """Find canonical table name by stripped name"""
         if not name:
             return None
             
-        stripped_target = strip_schema_prefix(name).lower()
-        for k in schema_keys:
-            if strip_schema_prefix(k).lower() == stripped_target:
-                return k
-        return None
+        return stripped_to_canonical.get(strip_schema_prefix(name).lower())
 
     def find_best_table_match(table_name):
         """Find the best match for a table"""
@@ -124,39 +232,29 @@ def auto_fix_sql_identifiers(
             return None
 
         # 1. First search for exact match (original form)
-        if table_name in schema_keys:
+        if table_name in schema_pool:
             return table_name
             
         # 2. Lowercase exact match
-        table_lower = table_name.lower()
-        if table_lower in schema_keys_lower:
-            idx = schema_keys_lower.index(table_lower)
-            return schema_keys[idx]
+        canonical = lower_to_canonical.get(table_name.lower())
+        if canonical:
+            return canonical
         
         # 3. Exact match for stripped form
         canonical = get_canonical_by_stripped(table_name)
         if canonical:
             return canonical
 
-        # 4. Fuzzy match
-        best_score = 0
-        best_can = None
+        # 4. Fuzzy match (scored in one rapidfuzz call; threshold value lowered to 70)
         stripped_input = strip_schema_prefix(table_name).lower()
         
         if not stripped_input:
             return None
             
-        for k in schema_keys:
-            stripped_k = strip_schema_prefix(k).lower()
-            if not stripped_k:
-                continue
-                
-            score = fuzz.ratio(stripped_input, stripped_k)
-            if score > best_score and score >= 70:  # Threshold value lowered
-                best_score = score
-                best_can = k
-        
-        return best_can
+        match = process.extractOne(
+            stripped_input, indices["stripped_keys"], scorer=fuzz.ratio, score_cutoff=70
+        )
+        return indices["canonical_keys"][match[2]] if match else None
 
     def find_best_column_match(column_name, table_name):
         """Find best column match for a table"""
@@ -167,40 +265,60 @@ def auto_fix_sql_identifiers(
         if not columns:
             return None, 0
             
-        col_lower = column_name.lower()
+        col_lower = sys.intern(column_name.lower())
         
-        # Exact match
-        for col in columns:
-            if col.lower() == col_lower:
-                return col, 100
+        # Exact match (case-insensitive, one dict probe)
+        exact = indices["column_lookup_by_table"][table_name].get(col_lower)
+        if exact is not None:
+            return exact, 100
         
-        # Fuzzy match
-        best_score = 0
-        best_col = None
-        for col in columns:
-            score = fuzz.ratio(col_lower, col.lower())
-            if score > best_score:
-                best_score = score
-                best_col = col
+        # Fuzzy match (scored in one rapidfuzz call over the precomputed lowercase names)
+        match = process.extractOne(col_lower, indices["columns_lower_by_table"][table_name], scorer=fuzz.ratio)
+        if not match or match[1] <= 0:
+            return None, 0
         
-        return best_col, best_score
+        return columns[match[2]], round(match[1])
 
     try:
-        parsed = sqlparse.parse(sql_text)
-        if not parsed:
+        flattened = _flatten_sql_tokens(sql_text)
+        if flattened is None:
             issues.append("SQL query could not be parsed.")
             return sql_text, changes, issues
-
-        stmt = parsed[0]
-        tokens = list(stmt.flatten())
+        tokens, offsets = flattened
         
         token_updates = {}
         table_aliases = {}
         from_tables_order = []
+        from_tables_seen = set()
+        # Table names (prefixed and unprefixed) and aliases, collected as they are discovered
+        table_names_and_aliases = set()
 
-        # DEBUG: Log current schema pool
-        print(f"🔍 Schema pool keys: {list(schema_pool.keys())}")
-        print(f"🔍 SQL to fix: {sql_text}")
+        # Whitespace-skip tables, built in one pass so neighbour lookups are O(1):
+        # next_nw[k] = first non-whitespace index >= k (n if none)
+        # prev_nw[k] = last non-whitespace index <= k (-1 if none)
+        # Token types bound to locals once; the loops below compare against them per token
+        T_KEYWORD = sqlparse.tokens.Keyword
+        T_NAME = sqlparse.tokens.Name
+        NAME_STR_KW = (T_NAME, sqlparse.tokens.String, T_KEYWORD)
+        NAME_STR = (T_NAME, sqlparse.tokens.String)
+        whitespace = (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline)
+        n = len(tokens)
+        is_ws = [t.ttype in whitespace for t in tokens]
+        next_nw = [n] * (n + 1)
+        for k in range(n - 1, -1, -1):
+            next_nw[k] = next_nw[k + 1] if is_ws[k] else k
+        prev_nw = [-1] * n
+        last = -1
+        for k in range(n):
+            if not is_ws[k]:
+                last = k
+            prev_nw[k] = last
+
+        # DEBUG: Log current schema pool (only with TEXT2SQL_DEBUG; skips formatting otherwise)
+        debug = settings.TEXT2SQL_DEBUG
+        if debug:
+            print(f"🔍 Schema pool keys: {list(schema_pool.keys())}")
+            print(f"🔍 SQL to fix: {sql_text}")
 
         # Step 1: FROM/JOIN clause parsing - IMPROVED
         i = 0
@@ -209,14 +327,12 @@ def auto_fix_sql_identifiers(
         while i < len(tokens):
             token = tokens[i]
             
-            if token.ttype is sqlparse.tokens.Keyword and token.value.upper() in ('FROM', 'JOIN'):
+            if token.ttype is T_KEYWORD and token.value.upper() in ('FROM', 'JOIN'):
                 # Find the table name following the token
-                j = i + 1
                 # Skip whitespaces
-                while j < len(tokens) and tokens[j].ttype in (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline):
-                    j += 1
+                j = next_nw[i + 1]
                 
-                if j < len(tokens) and tokens[j].ttype in (sqlparse.tokens.Name, sqlparse.tokens.String, sqlparse.tokens.Keyword):
+                if j < len(tokens) and tokens[j].ttype in NAME_STR_KW:
                     table_token = tokens[j]
                     original_table_name = table_token.value
                     
@@ -232,32 +348,31 @@ def auto_fix_sql_identifiers(
                             token_updates[j] = new_table_name
                         
                         # Add to FROM order
-                        if best_table not in from_tables_order:
+                        if best_table not in from_tables_seen:
+                            from_tables_seen.add(best_table)
                             from_tables_order.append(best_table)
+                            table_names_and_aliases.add(best_table.lower())
+                            table_names_and_aliases.add(strip_schema_prefix(best_table).lower())
                         
                         current_table = best_table
                         
                         # Alias handling
-                        alias_start = j + 1
-                        while (alias_start < len(tokens) and 
-                               tokens[alias_start].ttype in (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline)):
-                            alias_start += 1
+                        alias_start = next_nw[j + 1]
                         
                         if alias_start < len(tokens):
                             # Check for AS keyword
-                            if (tokens[alias_start].ttype == sqlparse.tokens.Keyword and 
+                            if (tokens[alias_start].ttype == T_KEYWORD and 
                                 tokens[alias_start].value.upper() == 'AS'):
-                                alias_start += 1
-                                while (alias_start < len(tokens) and 
-                                       tokens[alias_start].ttype in (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline)):
-                                    alias_start += 1
+                                alias_start = next_nw[alias_start + 1]
                             
                             # Alias name
                             if (alias_start < len(tokens) and 
-                                tokens[alias_start].ttype in (sqlparse.tokens.Name, sqlparse.tokens.String)):
+                                tokens[alias_start].ttype in NAME_STR):
                                 alias_name = tokens[alias_start].value
                                 table_aliases[alias_name] = current_table
-                                print(f"🔍 Alias detected: '{alias_name}' → '{current_table}'")
+                                table_names_and_aliases.add(alias_name.lower())
+                                if debug:
+                                    print(f"🔍 Alias detected: '{alias_name}' → '{current_table}'")
                     else:
                         issues.append(f"Table '{original_table_name}' not found in schema and no close match. Available: {list(schema_pool.keys())}")
             
@@ -265,32 +380,20 @@ def auto_fix_sql_identifiers(
 
         # Step 2: Column resolution - IMPROVED
         i = 0
-        
-        # Collect table names and aliases (SEPARATELY to avoid confusion)
-        table_names_and_aliases = set()
-        for table in from_tables_order:
-            # Add both prefixed and unprefixed versions
-            table_names_and_aliases.add(table.lower())
-            table_names_and_aliases.add(strip_schema_prefix(table).lower())
-        for alias in table_aliases.keys():
-            table_names_and_aliases.add(alias.lower())
 
         while i < len(tokens):
             token = tokens[i]
             
-            if token.ttype == sqlparse.tokens.Name:
+            if token.ttype == T_NAME:
                 # Check context
                 is_qualified = (i > 0 and tokens[i-1].value == '.')
-                is_table_reference = (i + 1 < len(tokens) and tokens[i+1].value == '.')
                 is_dot_after = (i + 1 < len(tokens) and tokens[i+1].value == '.')
                 
                 # Skip AS clause outputs (display names, not DB columns)
                 is_as_output = False
-                if i > 1 and tokens[i-1].ttype in (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline):
-                    j = i - 2
-                    while j >= 0 and tokens[j].ttype in (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline):
-                        j -= 1
-                    if j >= 0 and tokens[j].ttype == sqlparse.tokens.Keyword and tokens[j].value.upper() == 'AS':
+                if i > 1 and is_ws[i - 1]:
+                    j = prev_nw[i - 2]
+                    if j >= 0 and tokens[j].ttype == T_KEYWORD and tokens[j].value.upper() == 'AS':
                         is_as_output = True
                 
                 if is_as_output:
@@ -312,10 +415,7 @@ def auto_fix_sql_identifiers(
                 
                 if is_qualified:
                     # Qualified column: table.column
-                    table_index = i - 2
-                    while (table_index >= 0 and 
-                           tokens[table_index].ttype in (sqlparse.tokens.Whitespace, sqlparse.tokens.Newline)):
-                        table_index -= 1
+                    table_index = prev_nw[i - 2] if i >= 2 else -1
                     
                     if table_index >= 0:
                         table_ref = tokens[table_index].value
@@ -364,47 +464,71 @@ def auto_fix_sql_identifiers(
 
         # Apply token updates
         if token_updates:
-            new_tokens = []
-            for i, token in enumerate(tokens):
-                if i in token_updates:
-                    new_token = sqlparse.sql.Token(sqlparse.tokens.Name, token_updates[i])
-                    new_tokens.append(new_token)
-                else:
-                    new_tokens.append(token)
+            # Splice the replacements into the source text; unchanged tokens are never re-rendered
+            parts = []
+            cur = 0
+            for i in sorted(token_updates):
+                parts.append(sql_text[cur:offsets[i]])
+                parts.append(token_updates[i])
+                cur = offsets[i + 1]
+            parts.append(sql_text[cur:offsets[-1]])
             
-            fixed_sql = ''.join(str(t) for t in new_tokens)
+            fixed_sql = ''.join(parts)
         
         # STEP 3: Type casting - add ::TEXT for VARCHAR columns in comparisons
-        # Collect all VARCHAR columns (including alias resolution)
-        varchar_columns = {}  # {table_name: [col1, col2, ...]}
-        for table_name, table_data in schema_pool.items():
-            if not isinstance(table_data, dict):
-                continue
-            column_details = table_data.get('column_details', {})
-            varchar_cols = []
-            for col_name, col_info in column_details.items():
-                data_type = col_info.get('data_type', '').upper()
-                if 'VARCHAR' in data_type or 'TEXT' in data_type or 'CHARACTER' in data_type:
-                    varchar_cols.append(col_name)
-            if varchar_cols:
-                varchar_columns[table_name] = varchar_cols
+        # VARCHAR columns and their table-name cast targets come precomputed from the schema indices
+        varchar_columns = indices["varchar_columns"]
         
         # Add ::TEXT to VARCHAR columns in = comparisons (with alias support)
-        for table_name, cols in varchar_columns.items():
-            stripped_table = strip_schema_prefix(table_name)
-            # Find all aliases for this table
-            table_refs = [stripped_table]
-            for alias, aliased_table in table_aliases.items():
-                if aliased_table == table_name:
-                    table_refs.append(alias)
-            
-            for col_name in cols:
-                for table_ref in table_refs:
-                    # Pattern: table_ref.col_name = something (add ::TEXT after col_name)
-                    pattern = rf'\b{re.escape(table_ref)}\.{re.escape(col_name)}\b(?!\s*::)'
-                    if re.search(pattern, fixed_sql, re.IGNORECASE):
-                        fixed_sql = re.sub(pattern, f'{table_ref}.{col_name}::TEXT', fixed_sql, flags=re.IGNORECASE)
-                        changes.append(f"Type cast: {table_ref}.{col_name} → {table_ref}.{col_name}::TEXT")
+        # Only the uncast qualified references actually present in the SQL are candidates:
+        # without a '.' there is nothing to cast, and already-cast refs are skipped by the lookahead
+        present_refs = set()
+        if '.' in fixed_sql:
+            present_refs = {
+                (ref.lower(), col.lower()) for ref, col in _QUALIFIED_REF_RE.findall(fixed_sql)
+            }
+        
+        cast_targets = {}
+        if present_refs:
+            base_targets = indices["varchar_cast_targets"]
+            for key in present_refs:
+                target = base_targets.get(key)
+                if target is not None:
+                    cast_targets[key] = target
+            if table_aliases:
+                aliased_refs = {}
+                for alias, aliased_table in table_aliases.items():
+                    aliased_refs.setdefault(alias.lower(), (alias, aliased_table))
+                for ref_lower, col_lower in present_refs:
+                    if (ref_lower, col_lower) in cast_targets or ref_lower not in aliased_refs:
+                        continue
+                    alias, aliased_table = aliased_refs[ref_lower]
+                    for col_name in varchar_columns.get(aliased_table, ()):
+                        if col_name.lower() == col_lower:
+                            cast_targets[(ref_lower, col_lower)] = (alias, col_name)
+                            break
+
+        # All remaining (table_ref, column) pairs go into one alternation so the SQL is scanned once
+        if cast_targets:
+            refs = {ref for ref, _ in cast_targets.values()}
+            cols = {col for _, col in cast_targets.values()}
+            # Pattern: table_ref.col_name not already followed by a cast (add ::TEXT after col_name)
+            cast_re = re.compile(
+                rf'\b({"|".join(map(re.escape, refs))})\.({"|".join(map(re.escape, cols))})\b(?!\s*::)',
+                re.IGNORECASE
+            )
+
+            def _add_text_cast(match: re.Match) -> str:
+                target = cast_targets.get((match.group(1).lower(), match.group(2).lower()))
+                if target is None:
+                    return match.group(0)
+                table_ref, col_name = target
+                change = f"Type cast: {table_ref}.{col_name} → {table_ref}.{col_name}::TEXT"
+                if change not in changes:
+                    changes.append(change)
+                return f"{table_ref}.{col_name}::TEXT"
+
+            fixed_sql = cast_re.sub(_add_text_cast, fixed_sql)
 
     except Exception as e:
         issues.append(f"Error during auto-fix: {str(e)}")
@@ -412,4 +536,6 @@ def auto_fix_sql_identifiers(
         issues.append(f"Traceback: {traceback.format_exc()}")
         return sql_text, changes, issues
 
+    if len(indices["fix_results"]) < _FIX_RESULTS_PER_POOL:
+        indices["fix_results"][sql_text] = (fixed_sql, tuple(changes), tuple(issues))
     return fixed_sql, changes, issues
@@ -3,11 +3,72 @@ SQL Parser - Extract and parse SQL from LLM responses
 """
 
 import re
+from functools import lru_cache
 from typing import Optional
 
 from config import settings
 
+# Regex engine for LLM output: RE2 (linear-time, no catastrophic backtracking) when
+# google-re2 is installed, otherwise the stdlib engine. Flags are inline because
+# re2.compile takes an Options object instead of re flags.
+try:
+    import re2 as _regex
+except ImportError:
+    _regex = re
 
+# Precompiled extraction patterns (module-level: compiled once, not looked up per call)
+_TRAILING_BACKTICKS_RE = _regex.compile(r'\s*```\s*$')
+# I/İ/ı spelled out: RE2's case folding does not map the Turkish dotted/dotless i to I
+_ACIKLAMA_AFTER_SEMI_RE = _regex.compile(r'(?is);\s*(?:\*\*)?A[ÇC][Iİı]KLAMA(?:\*\*)?:.*$')
+_COMMENT_AFTER_SEMI_RE = _regex.compile(r'(?m);\s*--.*$')
+_SELECT_START_RE = _regex.compile(r'(?i)SELECT\s+')
+_KLAMA_RE = _regex.compile(r'(?i)klama')  # marker prefilter, searched in place (no upper() copy)
+
+def _strip_after_semicolon(sql: str) -> str:
+    """
+    Drop an AÇIKLAMA explanation or an inline comment that follows ';'.
+    Cheap substring checks skip the regex when the marker is not in the text (the common case).
+    """
+    if _KLAMA_RE.search(sql):  # any I/İ/ı spelling of AÇIKLAMA
+        sql = _ACIKLAMA_AFTER_SEMI_RE.sub(';', sql)
+    if '--' in sql:
+        sql = _COMMENT_AFTER_SEMI_RE.sub(';', sql)
+    return sql
+
+
+def _scan_fenced_sql(text: str) -> list:
+    """
+    Single left-to-right pass over the ``` fences using str.find only.
+    
+    Returns the candidate blocks in priority order, matching the old regex cascade:
+    the first ```sql block, then the first ``` block whose body starts with SELECT.
+    """
+    tagged = select_block = None
+    n = len(text)
+    pos = text.find('```')
+    while pos != -1 and (tagged is None or select_block is None):
+        after = pos + 3
+        if tagged is None and text[after:after + 3].lower() == 'sql':
+            end = text.find('```', after + 3)
+            if end == -1:
+                break  # no closing fence anywhere after this point
+            tagged = text[after + 3:end]
+        elif select_block is None:
+            j = after
+            while j < n and text[j].isspace():
+                j += 1
+            if text[j:j + 6].upper() == 'SELECT':
+                end = text.find('```', j + 6)
+                if end == -1:
+                    break
+                select_block = text[j:end]
+        pos = text.find('```', pos + 1)
+    return [block for block in (tagged, select_block) if block is not None]
+
+
+# Deterministic on its input: identical LLM outputs (temperature 0, cached prompts) skip re-parsing.
+# Keyed by the string itself - str caches its hash, and equality settles collisions.
+@lru_cache(maxsize=256)
 def extract_sql_from_response(text: str) -> str:
     """
     Extract SQL from an LLM response - safer and aggressive but careful.
@@ -27,42 +88,41 @@ def extract_sql_from_response(text: str) -> str:
         raise ValueError("❌ Boş metin verildi.")
 
     # 1) SQL inside a fenced code block (```sql ... ``` or ``` ... ``` containing SELECT)
-    fenced_patterns = [
-        r'```sql\s*(.*?)```',          # ```sql ... ```
-        r'```\s*(SELECT[\s\S]*?)```',  # ``` SELECT ... ```
-    ]
-    for pat in fenced_patterns:
-        m = re.search(pat, text, re.IGNORECASE | re.DOTALL)
-        if m:
-            sql = m.group(1).strip()
-            
-            # ✅ FIX: Remove trailing ``` if LLM added it after ;
-            sql = re.sub(r'\s*```\s*$', '', sql)
-            
-            # ✅ FIX: Remove **AÇIKLAMA:** or explanations after ;
-            sql = re.sub(r';\s*(\*\*)?A[ÇC]IKLAMA(\*\*)?:.*$', ';', sql, flags=re.IGNORECASE | re.DOTALL)
-            sql = re.sub(r';\s*--.*$', ';', sql, flags=re.MULTILINE)  # Remove inline comments after ;
-            
-            # If the block contains multiple statements, return the entire block.
-            # We assume the first one is the main query.
-            if sql.upper().startswith("SELECT"):
-                return sql
-    
-    # 2) Direct SQL: SELECT ... ; (most common)
-    m = re.search(r'(SELECT\s+[\s\S]+?;)', text, re.IGNORECASE | re.DOTALL)
-    if m:
-        sql = m.group(1).strip()
+    for block in _scan_fenced_sql(text):
+        sql = block.strip()
         
-        # ✅ FIX: Remove explanations after ;
-        sql = re.sub(r';\s*(\*\*)?A[ÇC]IKLAMA(\*\*)?:.*$', ';', sql, flags=re.IGNORECASE | re.DOTALL)
-        sql = re.sub(r';\s*--.*$', ';', sql, flags=re.MULTILINE)
+        # ✅ FIX: Remove trailing ``` if LLM added it after ;
+        if sql.endswith('`'):
+            sql = _TRAILING_BACKTICKS_RE.sub('', sql)
         
-        return sql
+        # ✅ FIX: Remove **AÇIKLAMA:** or explanations after ;
+        sql = _strip_after_semicolon(sql)  # Also removes inline comments after ;
+        
+        # If the block contains multiple statements, return the entire block.
+        # We assume the first one is the main query.
+        if sql[:6].upper() == "SELECT":  # only the prefix, not the whole block
+            return sql
     
-    # 3) Fallback: just SELECT without semicolon (riskier, but acceptable)
-    m = re.search(r'(SELECT\s+.+)', text, re.IGNORECASE | re.DOTALL)
+    # Branches 2 and 3 share the same start: the first SELECT followed by whitespace
+    m = _SELECT_START_RE.search(text)
     if m:
-        sql = m.group(1).strip()
+        start = m.start()
+        
+        # 2) Direct SQL: SELECT ... ; (most common)
+        ws_end = m.end()
+        semi = text.find(';', ws_end + 1)  # at least one char between the whitespace and ';'
+        if semi == -1 and ws_end - start > 7 and text[ws_end:ws_end + 1] == ';':
+            semi = ws_end  # 'SELECT  ;' - the last whitespace char is the body
+        if semi != -1:
+            sql = text[start:semi + 1].strip()
+            
+            # ✅ FIX: Remove explanations after ;
+            sql = _strip_after_semicolon(sql)
+            
+            return sql
+        
+        # 3) Fallback: just SELECT without semicolon (riskier, but acceptable)
+        sql = text[start:].strip()
         # Stop at common break points
         for stop_word in ['**AÇIKLAMA', '**Explanation', 'Note:', 'Açıklama:', '\n\n---']:
             idx = sql.find(stop_word)
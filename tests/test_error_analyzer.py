@@ -0,0 +1,34 @@
+"""
+SQLErrorAnalyzer suggestion tests
+"""
+
+from core.error_analyzer import SQLErrorAnalyzer, MAX_SUGGESTIONS
+
+
+SCHEMA_POOL = {
+    "m_ilce": {"columns": ["ilce_adi", "ilce_id", "il_id"]},
+    "m_il": ["il_adi", "il_id"],
+    "customers": {"columns": ["name", "email"]},
+}
+
+
+def test_suggest_columns_for_typo():
+    suggestions = SQLErrorAnalyzer()._suggest_columns(
+        SCHEMA_POOL, 'column "ilce_addi" does not exist'
+    )
+    assert suggestions
+    assert len(suggestions) <= MAX_SUGGESTIONS
+    assert suggestions[0]["suggested"] == "ilce_adi"
+    assert suggestions[0]["table"] == "m_ilce"
+    assert suggestions[0]["reason"] == "Similar column name"
+
+
+def test_suggest_columns_without_quoted_column():
+    assert SQLErrorAnalyzer()._suggest_columns(SCHEMA_POOL, "syntax error at end of input") == []
+
+
+def test_suggest_tables_for_partial_name():
+    suggestions = SQLErrorAnalyzer()._suggest_tables(
+        SCHEMA_POOL, 'relation error: table "ilce" does not exist'
+    )
+    assert suggestions[0]["suggested"] == "m_ilce"
@@ -0,0 +1,65 @@
+"""
+run_sql / results_to_html tests
+"""
+
+from contextlib import contextmanager
+
+import sql.executor as executor
+
+
+class _FakeCursor:
+    name = None
+
+    def __init__(self, rows):
+        self._rows = list(rows)
+        self.description = [("id",)]
+
+    def execute(self, sql):
+        pass
+
+    def fetchmany(self, size):
+        batch, self._rows = self._rows[:size], self._rows[size:]
+        return batch
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _FakeConnection:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def cursor(self, name=None):
+        return _FakeCursor(self._rows)
+
+
+def _patch_rows(monkeypatch, rows):
+    @contextmanager
+    def fake_pooled_connection():
+        yield _FakeConnection(rows)
+
+    monkeypatch.setattr(executor, "pooled_connection", fake_pooled_connection)
+
+
+def test_run_sql_flags_result_cut_off_at_max_rows(monkeypatch):
+    _patch_rows(monkeypatch, [(i,) for i in range(6)])
+    columns, rows, truncated = executor.run_sql("SHOW ALL", max_rows=5)
+    assert columns == ["id"]
+    assert len(rows) == 5
+    assert truncated
+
+
+def test_run_sql_result_of_exactly_max_rows_is_not_truncated(monkeypatch):
+    _patch_rows(monkeypatch, [(i,) for i in range(5)])
+    _, rows, truncated = executor.run_sql("SHOW ALL", max_rows=5)
+    assert len(rows) == 5
+    assert not truncated
+
+
+def test_results_to_html_labels_only_truncated_results():
+    rows = [(i,) for i in range(3)]
+    assert "limit reached" in executor.results_to_html(["id"], rows, truncated=True)
+    assert "limit reached" not in executor.results_to_html(["id"], rows)
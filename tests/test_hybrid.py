@@ -0,0 +1,24 @@
+"""
+hybrid_search_with_separate_results tests
+"""
+
+import search.hybrid as hybrid
+
+
+def test_similar_tables_break_ties_like_sorted(monkeypatch):
+    # Six tables tie at 0.5 for the last two places; the first two inserted must win
+    scores = [0.9, 0.5, 0.9, 0.5, 0.5, 0.5, 0.9, 0.5, 0.5, 0.7]
+    results = [
+        {"table": f"t{i}", "column": "id", "similarity": score}
+        for i, score in enumerate(scores)
+    ]
+    monkeypatch.setattr(hybrid, "semantic_search", lambda query, top_k: results)
+    for name in ("lexical_search", "keyword_search", "data_values_search"):
+        monkeypatch.setattr(hybrid, name, lambda query, top_k: [])
+
+    result = hybrid.hybrid_search_with_separate_results("satışları göster")
+
+    expected = sorted(((r["table"], r["similarity"]) for r in results),
+                      key=lambda x: x[1], reverse=True)[:6]
+    assert result["similar_tables"] == expected
+    assert [table for table, _ in result["similar_tables"]][4:] == ["t1", "t3"]
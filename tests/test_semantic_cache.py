@@ -0,0 +1,39 @@
+"""
+SemanticSQLCache tests
+"""
+
+import numpy as np
+
+from core.semantic_cache import SemanticSQLCache, extract_literals
+
+
+def _embedding(seed: int = 0, noise: float = 0.0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vec = rng.standard_normal(16).astype(np.float32)
+    if noise:
+        vec += noise * np.random.default_rng(seed + 1).standard_normal(16).astype(np.float32)
+    return vec
+
+
+def test_questions_differing_only_in_year_do_not_share_sql():
+    cache = SemanticSQLCache(maxsize=8, threshold=0.92)
+    cache.insert(_embedding(), 0, "2023 yılındaki satışları getir",
+                 "SELECT * FROM satislar WHERE yil = 2023")
+
+    # Embeddings of the two questions are near-identical; the literals are not
+    assert cache.lookup(_embedding(noise=0.01), 0, "2024 yılındaki satışları getir") is None
+
+
+def test_paraphrase_with_same_literals_hits():
+    cache = SemanticSQLCache(maxsize=8, threshold=0.92)
+    sql = "SELECT * FROM satislar WHERE yil = 2023"
+    cache.insert(_embedding(), 0, "2023 yılındaki satışları getir", sql)
+
+    hit = cache.lookup(_embedding(noise=0.01), 0, "2023 yılı satışlarını listele")
+    assert hit is not None
+    assert hit[1] == sql
+
+
+def test_extract_literals():
+    assert extract_literals("'Kadıköy' ilçesindeki 5 abone") == ("5", "kadıköy")
+    assert extract_literals("İstanbul'da ve İzmir'de kaç abone var") == ()
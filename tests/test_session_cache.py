@@ -0,0 +1,51 @@
+"""
+SessionCache tests
+"""
+
+import threading
+
+from api.session_cache import SessionCache
+
+
+def test_factory_runs_outside_the_lock():
+    cache = SessionCache(maxsize=8, ttl=60)
+    cache["other"] = "ready"
+    seen = []
+    seen_while_building = []
+
+    def factory():
+        # Another thread must be able to read the cache while this session is being built
+        reader = threading.Thread(target=lambda: seen.append(cache["other"]))
+        reader.start()
+        reader.join(timeout=2)
+        seen_while_building.extend(seen)
+        return "built"
+
+    worker = threading.Thread(target=lambda: cache.get_or_create("new", factory))
+    worker.start()
+    worker.join(timeout=5)
+    assert seen_while_building == ["ready"]
+    assert cache["new"] == "built"
+
+
+def test_concurrent_creates_share_one_value():
+    cache = SessionCache(maxsize=8, ttl=60)
+    barrier = threading.Barrier(2)
+    results = []
+
+    def factory():
+        value = object()
+        barrier.wait(timeout=2)  # both threads are past the first lookup
+        return value
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_create("s", factory)))
+        for _ in range(2)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert len(results) == 2
+    assert results[0] is results[1]
+    assert len(cache) == 1
@@ -0,0 +1,37 @@
+"""
+InteractiveSQLGenerator LLM call tests
+"""
+
+import threading
+from collections import OrderedDict
+
+from core.sql_generator import InteractiveSQLGenerator, _LLM_STOP
+
+
+class _RecordingLLM:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return {"choices": [{"text": "SELECT 1"}]}
+
+
+def _generator(llm):
+    # Skip __init__ (loads models and the schema); _call_llm_cached only needs these
+    generator = InteractiveSQLGenerator.__new__(InteractiveSQLGenerator)
+    generator.llm = llm
+    generator.llm_cache = OrderedDict()
+    generator._llm_cache_lock = threading.Lock()
+    return generator
+
+
+def test_stop_sequences_reach_the_llm_as_a_list():
+    llm = _RecordingLLM()
+    _generator(llm)._call_llm_cached(
+        "prompt", max_tokens=16, temperature=0, top_p=0.9, stop=_LLM_STOP
+    )
+    stop = llm.calls[0]["stop"]
+    # llama-cpp silently ignores a tuple stop
+    assert isinstance(stop, list)
+    assert stop == list(_LLM_STOP)
@@ -4,7 +4,7 @@ Provides low-level utilities for GPU, DB, Qdrant, and ML models.
 """
 
 from .gpu import detect_gpu_availability, get_device_info, GPU_INFO, DEVICE
-from .db import get_connection
+from .db import get_connection, pooled_connection
 from .qdrant import get_qdrant_client, normalize_qdrant_hit
 from .models import ModelManager
 
@@ -14,6 +14,7 @@ __all__ = [
     'GPU_INFO',
     'DEVICE',
     'get_connection',
+    'pooled_connection',
     'get_qdrant_client',
     'normalize_qdrant_hit',
     'ModelManager',
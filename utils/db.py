@@ -2,8 +2,15 @@
 Database Connection Management
 """
 
+import threading
+from contextlib import contextmanager
+
 import psycopg2
-from config import get_db_conn_kwargs
+from psycopg2.pool import ThreadedConnectionPool
+from config import settings, get_db_conn_kwargs
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
 
 
 def get_connection():
@@ -15,3 +22,42 @@ def get_connection():
     """
     kwargs = get_db_conn_kwargs()
     return psycopg2.connect(**kwargs)
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Lazily create the shared, thread-safe connection pool."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ThreadedConnectionPool(
+                    settings.DB_POOL_MIN,
+                    settings.DB_POOL_MAX,
+                    **get_db_conn_kwargs()
+                )
+    return _POOL
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the shared pool for the duration of the block.
+    
+    Avoids a TCP handshake + Postgres auth on every query. The connection is
+    returned to the pool afterwards (an open transaction is rolled back by the
+    pool); broken connections are discarded instead of being reused.
+    
+    Yields:
+        psycopg2.connection: Pooled PostgreSQL connection
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        pool.putconn(conn, close=True)
+        conn = None
+        raise
+    finally:
+        if conn is not None:
+            pool.putconn(conn, close=bool(conn.closed))
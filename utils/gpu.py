@@ -2,8 +2,12 @@
 GPU Detection and Device Management
 """
 
+import os
+
 from config import settings
 
+_TORCH_THREADS_CONFIGURED = False
+
 
 def detect_gpu_availability():
     """
@@ -60,8 +64,33 @@ def get_device_info():
     return device
 
 
+def configure_torch_threads(device: str):
+    """
+    CPU'da PyTorch thread sayısını açıkça ayarla (bazı ortamlarda varsayılan tek thread'dir).
+    Intra-op: settings.TORCH_NUM_THREADS veya çekirdek sayısı; inter-op: 2. Yalnızca bir kez çalışır.
+    """
+    global _TORCH_THREADS_CONFIGURED
+    if device != 'cpu' or _TORCH_THREADS_CONFIGURED:
+        return
+    _TORCH_THREADS_CONFIGURED = True
+    try:
+        import torch
+    except ImportError:
+        return
+    
+    num_threads = settings.TORCH_NUM_THREADS or os.cpu_count() or 4
+    torch.set_num_threads(num_threads)
+    try:
+        # Only allowed before any inter-op parallel work has started
+        torch.set_num_interop_threads(2)
+    except RuntimeError:
+        pass
+    print(f"🧵 PyTorch CPU thread sayısı: {num_threads}")
+
+
 # GPU durumunu başlangıçta tespit et
 GPU_INFO = detect_gpu_availability()
 
 # SentenceTransformer için device seçimi
 DEVICE = get_device_info()
+configure_torch_threads(DEVICE)
@@ -12,6 +12,51 @@ from config import settings
 from .gpu import GPU_INFO, DEVICE
 
 
+def _local_model_dir(model_name: str):
+    """Local safetensors copy of a hub model under EMBEDDING_CACHE_DIR (None when disabled)."""
+    if not settings.EMBEDDING_CACHE_DIR or os.path.isdir(model_name):
+        return None
+    return os.path.join(settings.EMBEDDING_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def _load_sentence_transformer(model_name: str, device: str = DEVICE):
+    """
+    Load a SentenceTransformer with the fastest available inference path.
+    
+    - Local copy: after the first hub load the model is saved once as safetensors under
+      EMBEDDING_CACHE_DIR; later starts load that (mmap-able, no hub round-trips)
+    - CUDA: FP16 weights (halves memory traffic; cosine scores are unaffected)
+    - CPU with EMBEDDING_ONNX: ONNX Runtime backend (fused graph), falling back to
+      PyTorch if optimum/onnxruntime is not installed or the export fails
+    
+    `device` defaults to the API's detected DEVICE; build_vectorDB.py passes its own.
+    """
+    local_dir = _local_model_dir(model_name)
+    has_local_copy = local_dir is not None and os.path.exists(os.path.join(local_dir, "modules.json"))
+    source = local_dir if has_local_copy else model_name
+
+    if device == 'cpu' and settings.EMBEDDING_ONNX:
+        try:
+            model = SentenceTransformer(source, device=device, backend="onnx")
+            print(f"⚡ {model_name} ONNX Runtime ile çalışacak")
+            return model
+        except Exception as e:
+            print(f"⚠️ ONNX backend yüklenemedi ({e}); PyTorch kullanılacak. "
+                  f"Kurulum: pip install 'optimum[onnxruntime]'")
+    
+    model = SentenceTransformer(source, device=device)
+    if local_dir is not None and not has_local_copy:
+        try:
+            model.save(local_dir, safe_serialization=True)  # full precision, before .half()
+            print(f"💾 {model_name} yerel kopyası kaydedildi: {local_dir}")
+        except Exception as e:
+            print(f"⚠️ Model yerel kopyası kaydedilemedi ({e})")
+    if device == 'cuda' and settings.EMBEDDING_FP16:
+        model.half()
+        print(f"⚡ {model_name} GPU'da FP16 ile çalışacak")
+    return model
+
+
 class ModelManager:
     """
     Singleton class to manage all ML models.
@@ -41,10 +86,7 @@ class ModelManager:
         """Get or load embedding model (lazy loading)."""
         if self._embedding_model is None:
             print(f"⏳ Loading embedding model on {DEVICE.upper()}...")
-            self._embedding_model = SentenceTransformer(
-                settings.EMBEDDING_MODEL_NAME, 
-                device=DEVICE
-            )
+            self._embedding_model = _load_sentence_transformer(settings.EMBEDDING_MODEL_NAME)
             print(f"✅ Embedding model ready on {DEVICE.upper()}!")
         return self._embedding_model
     
@@ -53,7 +95,7 @@ class ModelManager:
         if self._semantic_model is None:
             print(f"⏳ Loading semantic model on {DEVICE.upper()}...")
             model_name = settings.SEMANTIC_MODEL_NAME or settings.EMBEDDING_MODEL_NAME
-            self._semantic_model = SentenceTransformer(model_name, device=DEVICE)
+            self._semantic_model = _load_sentence_transformer(model_name)
             print(f"✅ Semantic model ready on {DEVICE.upper()}!")
         return self._semantic_model
     